@@ -5,11 +5,11 @@ from starlette.responses import RedirectResponse
 from app.auth.dao import UsersDAO
 from app.auth.models import User
 from app.auth.schemas import UsernameModel
-from app.auth.utils import token_service
+from app.auth.utils import login_rate_limiter, password_service, token_service
 from app.config import settings
-from app.dao.database import async_session_maker
-from app.auth.dependencies import get_current_admin_user, get_current_user, check_refresh_token, get_client_fingerprint
-from app.exceptions import TokenExpiredException
+from app.dao.unit_of_work import UnitOfWork
+from app.auth.dependencies import get_current_admin_user, get_current_user, check_refresh_token, get_client_fingerprint, get_client_ip
+from app.exceptions import NoJwtException, TokenExpiredException, TooManyRequestsException
 
 
 class AdminAuth(AuthenticationBackend):
@@ -25,18 +25,26 @@ class AdminAuth(AuthenticationBackend):
         form = await request.form()
         username, password = form.get('username'), form.get('password')
 
-        async with async_session_maker() as session:
-            user: User = await UsersDAO(session).find_one_or_none(
+        try:
+            await login_rate_limiter.check(client_ip=get_client_ip(request), username=username)
+        except TooManyRequestsException:
+            return False
+
+        async with UnitOfWork() as uow:
+            user: User = await UsersDAO(uow.read_session).find_one_or_none(
                 filters=UsernameModel(username=username)
             )
 
-        if user:
-            request.session.update(
-                token_service.create_tokens(
-                    data={"sub": str(user.id)},
-                    client_fingerprint=get_client_fingerprint(request),
-                )
+        if not (user and await password_service.authenticate_user_async(user=user, password=password)):
+            return False
+
+        request.session.update(
+            await token_service.create_tokens(
+                data={"sub": str(user.id)},
+                client_fingerprint=get_client_fingerprint(request),
+                claims=token_service.get_user_claims(user),
             )
+        )
 
         return True
 
@@ -61,7 +69,7 @@ class AdminAuth(AuthenticationBackend):
         if not user_id:
             return RedirectResponse(request.url_for('admin:login'), status_code=302)
         
-        token_service.invalidate_token_pair(
+        await token_service.invalidate_token_pair(
             user_id=user_id,
             client_fingerprint=client_fingerprint,
         )
@@ -76,7 +84,8 @@ class AdminAuth(AuthenticationBackend):
         1. Проверяет наличие access_token в сессии
         2. Если токен отсутствует - перенаправляет на страницу входа
         3. Проверяет валидность access_token и получает пользователя
-        4. При истечении access_token пытается обновить токены через refresh_token
+        4. При истечении access_token обновляет пару токенов через refresh_token;
+           отозванный или уже использованный refresh_token ведет на страницу входа
         5. Проверяет наличие прав супер администратора у пользователя
         6. При отсутствии прав перенаправляет на страницу входа
         
@@ -89,17 +98,34 @@ class AdminAuth(AuthenticationBackend):
         if not access_token:
             return RedirectResponse(request.url_for('admin:login'), status_code=302)
 
-        async with async_session_maker() as session:
+        client_fingerprint = get_client_fingerprint(request)
+
+        # Одна единица работы на запрос: пользователь загружается не более одного раза
+        async with UnitOfWork() as uow:
             try:
-                user = await get_current_user(token=access_token, session=session)
+                user = await get_current_user(
+                    token=access_token,
+                    db_session=uow.read_session,
+                    client_fingerprint=client_fingerprint,
+                )
             except TokenExpiredException:
-                user = check_refresh_token(token=refresh_token, session=session)
-                request.session.update(
-                    token_service.create_tokens(
-                        data={'sub': str(user.id)},
-                        client_fingerprint=get_client_fingerprint(request),
-                    )
+                if not refresh_token:
+                    return RedirectResponse(request.url_for('admin:login'), status_code=302)
+                try:
+                    user = await check_refresh_token(token=refresh_token, session=uow.read_session)
+                except NoJwtException:
+                    return RedirectResponse(request.url_for('admin:login'), status_code=302)
+
+                # Как и /auth/refresh: проверка refresh-токена и замена пары выполняются в Redis атомарно
+                tokens = await token_service.rotate_tokens(
+                    refresh_token=refresh_token,
+                    data={'sub': str(user.id)},
+                    client_fingerprint=client_fingerprint,
+                    claims=token_service.get_user_claims(user),
                 )
+                if tokens is None:
+                    return RedirectResponse(request.url_for('admin:login'), status_code=302)
+                request.session.update(tokens)
 
             if not user:
                 return RedirectResponse(request.url_for('admin:login'), status_code=302)
@@ -0,0 +1,127 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from loguru import logger
+
+from app.metrics import metrics
+
+
+T = TypeVar('T')
+
+
+class CircuitOpenError(Exception):
+    """Вызов отклонен: цепь разомкнута"""
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для вызовов внешнего хранилища
+
+    Вызов, завершившийся ошибкой, не уложившийся в call_timeout или
+    выполнявшийся дольше slow_call_seconds, считается неудачным. После
+    failure_threshold неудач подряд цепь размыкается, и вызовы сразу
+    отклоняются с CircuitOpenError, не дожидаясь таймаутов сокета.
+    Через reset_seconds пропускается один пробный вызов: при успехе цепь
+    замыкается, при неудаче снова размыкается.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+            self,
+            name: str,
+            failure_threshold: int,
+            call_timeout: float,
+            slow_call_seconds: float,
+            reset_seconds: float,
+            errors: tuple[type[BaseException], ...] = (Exception,),
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.call_timeout = call_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_seconds = reset_seconds
+        self.errors = errors
+        self.failures = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._retry_at = 0.0
+        self._trial_in_progress = False
+
+        metrics.describe(f"{name}_circuit_state", "Состояние предохранителя: 0 - замкнут, 1 - пробный вызов, 2 - разомкнут")
+        metrics.describe(f"{name}_circuit_opened_total", "Число размыканий предохранителя")
+        metrics.describe(f"{name}_circuit_closed_total", "Число замыканий предохранителя после сбоя")
+        metrics.describe(f"{name}_circuit_rejected_total", "Число вызовов, отклоненных разомкнутым предохранителем")
+        metrics.register_gauge(f"{name}_circuit_state", lambda: self.STATE_VALUES[self.state])
+
+    @property
+    def state(self) -> str:
+        """Текущее состояние с учетом истечения времени размыкания"""
+        if self._state == self.OPEN and time.monotonic() >= self._retry_at:
+            self._state = self.HALF_OPEN
+            logger.info(f"Предохранитель {self.name}: пробный вызов")
+        return self._state
+
+    def open_duration(self) -> float:
+        """Сколько секунд цепь не замкнута (0, если замкнута)"""
+        if self._state == self.CLOSED:
+            return 0.0
+        return time.monotonic() - self._opened_at
+
+    def _record_success(self) -> None:
+        """Учесть успешный вызов"""
+        self.failures = 0
+        if self._state != self.CLOSED:
+            self._state = self.CLOSED
+            metrics.inc(f"{self.name}_circuit_closed_total")
+            logger.info(f"Предохранитель {self.name} замкнут")
+
+    def _record_failure(self) -> None:
+        """Учесть неудачный вызов и при необходимости разомкнуть цепь"""
+        self.failures += 1
+        if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self.failures >= self.failure_threshold
+        ):
+            # Время отсчитывается от первого размыкания, пока цепь не замкнется
+            if self._state == self.CLOSED:
+                self._opened_at = time.monotonic()
+                metrics.inc(f"{self.name}_circuit_opened_total")
+                logger.warning(f"Предохранитель {self.name} разомкнут после {self.failures} неудачных вызовов")
+            self._state = self.OPEN
+            self._retry_at = time.monotonic() + self.reset_seconds
+
+    async def call(self, func: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """
+        Выполнить вызов через предохранитель
+
+        Raises:
+            CircuitOpenError: Цепь разомкнута или уже выполняется пробный вызов
+            TimeoutError: Вызов не уложился в call_timeout
+        """
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._trial_in_progress):
+            metrics.inc(f"{self.name}_circuit_rejected_total")
+            raise CircuitOpenError(self.name)
+
+        trial = state == self.HALF_OPEN
+        self._trial_in_progress = self._trial_in_progress or trial
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(self.call_timeout):
+                result = await func(*args, **kwargs)
+        except (*self.errors, TimeoutError):
+            self._record_failure()
+            raise
+        finally:
+            if trial:
+                self._trial_in_progress = False
+
+        if time.monotonic() - started >= self.slow_call_seconds:
+            self._record_failure()
+        else:
+            self._record_success()
+        return result
@@ -0,0 +1,185 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Literal
+
+from jose import jwt
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError, JWTError
+
+
+class BaseJWTCodec(ABC):
+    """
+    Базовый класс кодека JWT
+
+    Кодеки выбрасывают исключения python-jose (JWTError, ExpiredSignatureError),
+    поэтому обработка ошибок в зависимостях не зависит от выбранного кодека.
+    """
+
+    name: str = None
+
+    def __init__(self, algorithm: str):
+        self.algorithm = algorithm
+
+    @abstractmethod
+    def encode(self, payload: dict, key: Any, headers: dict | None = None) -> str:
+        """Подписать полезную нагрузку"""
+
+    @abstractmethod
+    def decode(self, token: str, key: Any) -> dict:
+        """Проверить подпись и срок действия токена и получить полезную нагрузку"""
+
+    @abstractmethod
+    def get_unverified_header(self, token: str) -> dict:
+        """Получить заголовок токена без проверки подписи"""
+
+
+class JoseCodec(BaseJWTCodec):
+    """Кодек на основе python-jose (поддерживает все алгоритмы)"""
+
+    name = 'jose'
+
+    def encode(self, payload: dict, key: Any, headers: dict | None = None) -> str:
+        return jwt.encode(payload, key, algorithm=self.algorithm, headers=headers)
+
+    def decode(self, token: str, key: Any) -> dict:
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+    def get_unverified_header(self, token: str) -> dict:
+        return jwt.get_unverified_header(token)
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b'=' * (-len(data) % 4))
+
+
+class HS256Codec(BaseJWTCodec):
+    """
+    Минимальный кодек HS256
+
+    Переиспользует заранее подготовленное состояние HMAC для каждого ключа
+    и закодированные сегменты заголовков, поэтому на каждый токен приходится
+    только сериализация полезной нагрузки и одно вычисление HMAC.
+    """
+
+    name = 'hs256'
+
+    def __init__(self, algorithm: str = 'HS256'):
+        if algorithm != 'HS256':
+            raise ValueError(f"Кодек hs256 не поддерживает алгоритм {algorithm}")
+        super().__init__(algorithm)
+        self._hmacs: dict[str, hmac.HMAC] = {}
+        self._header_segments: dict[str, bytes] = {}
+
+    def _get_hmac(self, key: str) -> hmac.HMAC:
+        """Получить подготовленное состояние HMAC для ключа"""
+        prepared = self._hmacs.get(key)
+        if prepared is None:
+            prepared = self._hmacs[key] = hmac.new(key.encode(), digestmod=hashlib.sha256)
+        return prepared.copy()
+
+    def _get_header_segment(self, headers: dict | None) -> bytes:
+        """Получить закодированный сегмент заголовка"""
+        header = {'alg': self.algorithm, 'typ': 'JWT', **(headers or {})}
+        cache_key = json.dumps(header, sort_keys=True)
+        segment = self._header_segments.get(cache_key)
+        if segment is None:
+            segment = _b64encode(json.dumps(header, separators=(',', ':'), sort_keys=True).encode())
+            self._header_segments[cache_key] = segment
+        return segment
+
+    def encode(self, payload: dict, key: str, headers: dict | None = None) -> str:
+        signing_input = b'.'.join((
+            self._get_header_segment(headers),
+            _b64encode(json.dumps(payload, separators=(',', ':')).encode()),
+        ))
+        signature = self._get_hmac(key)
+        signature.update(signing_input)
+        return b'.'.join((signing_input, _b64encode(signature.digest()))).decode()
+
+    def _split(self, token: str) -> tuple[bytes, bytes, bytes]:
+        """Разделить токен на сегменты"""
+        try:
+            header_segment, payload_segment, signature_segment = token.encode().split(b'.')
+        except (AttributeError, ValueError):
+            raise JWTError("Некорректный формат токена")
+        return header_segment, payload_segment, signature_segment
+
+    @staticmethod
+    def _load_segment(segment: bytes) -> dict:
+        """Декодировать JSON-сегмент токена"""
+        try:
+            data = json.loads(_b64decode(segment))
+        except (binascii.Error, ValueError):
+            raise JWTError("Некорректный сегмент токена")
+        if not isinstance(data, dict):
+            raise JWTError("Некорректный сегмент токена")
+        return data
+
+    def get_unverified_header(self, token: str) -> dict:
+        return self._load_segment(self._split(token)[0])
+
+    def decode(self, token: str, key: str) -> dict:
+        header_segment, payload_segment, signature_segment = self._split(token)
+
+        if self._load_segment(header_segment).get('alg') != self.algorithm:
+            raise JWTError("Алгоритм подписи не разрешен")
+
+        expected = self._get_hmac(key)
+        expected.update(header_segment + b'.' + payload_segment)
+        try:
+            signature = _b64decode(signature_segment)
+        except binascii.Error:
+            raise JWTError("Некорректная подпись токена")
+        if not hmac.compare_digest(expected.digest(), signature):
+            raise JWTError("Подпись токена не прошла проверку")
+
+        claims = self._load_segment(payload_segment)
+        self._validate_claims(claims)
+        return claims
+
+    @staticmethod
+    def _validate_claims(claims: dict) -> None:
+        """Проверить зарегистрированные поля так же, как python-jose по умолчанию"""
+        now = time.time()
+        for claim in ('exp', 'nbf', 'iat'):
+            if claim in claims and not isinstance(claims[claim], (int, float)):
+                raise JWTClaimsError(f"Поле {claim} должно быть числом")
+
+        if 'nbf' in claims and claims['nbf'] > now:
+            raise JWTClaimsError("Токен еще не действителен")
+        if 'exp' in claims and claims['exp'] < now:
+            raise ExpiredSignatureError("Срок действия токена истек")
+        if 'sub' in claims and not isinstance(claims['sub'], str):
+            raise JWTClaimsError("Поле sub должно быть строкой")
+        if 'jti' in claims and not isinstance(claims['jti'], str):
+            raise JWTClaimsError("Поле jti должно быть строкой")
+        # Аудитория при декодировании не задается, поэтому токен с полем aud не предназначен сервису
+        if 'aud' in claims:
+            raise JWTClaimsError("Недопустимая аудитория токена")
+
+
+CODECS: dict[str, type[BaseJWTCodec]] = {
+    JoseCodec.name: JoseCodec,
+    HS256Codec.name: HS256Codec,
+}
+
+
+def create_codec(name: Literal['auto', 'jose', 'hs256'], algorithm: str) -> BaseJWTCodec:
+    """
+    Создать кодек JWT
+
+    Args:
+        name: Название кодека, 'auto' - самый быстрый из поддерживающих алгоритм
+        algorithm: Алгоритм подписи
+    """
+    if name == 'auto':
+        name = HS256Codec.name if algorithm == 'HS256' else JoseCodec.name
+    return CODECS[name](algorithm)
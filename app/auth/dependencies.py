@@ -1,17 +1,19 @@
 from datetime import datetime, timezone
 import hashlib
+import hmac
 from typing import Annotated
 import uuid
 
-from fastapi import Request, Depends
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import Request, Depends, Header
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import jwt, JWTError, ExpiredSignatureError
 from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 
 from app.auth.dao import UsersDAO
 from app.auth.models import User
-from app.auth.utils import token_service
+from app.auth.schemas import RoleModel, SUserPrincipal
+from app.auth.utils import login_rate_limiter, token_service
 from app.config import settings
 from app.dao.dependencies import get_session_without_commit
 from app.exceptions import (
@@ -44,7 +46,7 @@ async def check_refresh_token(
     try:
         payload = token_service.decode_token(token)
         user_id = payload.get("sub")
-        if not user_id:
+        if not user_id or payload.get("type") != "refresh":
             raise NoJwtException
 
         user = await UsersDAO(session).find_one_or_none_by_id(data_id=int(user_id))
@@ -62,21 +64,54 @@ def get_client_fingerprint(request: Request) -> str:
     Используется для идентификации клиента в системе.
     """
     user_agent = request.headers.get("User-Agent")
-    ip = request.client.host
+    ip = get_client_ip(request)
     
     logger.info(f"User-Agent: {user_agent}, IP: {ip}")
     
+    return build_client_fingerprint(user_agent, ip)
+
+
+def get_client_ip(request: Request) -> str | None:
+    """
+    Получаем IP-адрес клиента.
+
+    За прокси адрес берется из X-Forwarded-For, если uvicorn запущен с --proxy-headers
+    и адрес прокси входит в --forwarded-allow-ips. Для некоторых транспортов адрес неизвестен.
+    """
+    return request.client.host if request.client else None
+
+
+def build_client_fingerprint(user_agent: str | None, ip: str | None) -> str:
+    """Вычисляем идентификатор клиента по User-Agent и IP-адресу."""
     raw = f"{user_agent}-{ip}"
     return hashlib.sha256(raw.encode()).hexdigest()
 
 
-async def get_current_user(
-        token: Annotated[str, Depends(oauth2_scheme)],
-        db_session: AsyncSession = Depends(get_session_without_commit),
-        client_fingerprint: str = Depends(get_client_fingerprint),
-        token_type: str = "access",
-) -> User:
-    """Проверяем access_token и возвращаем пользователя."""    
+async def check_introspection_secret(
+        x_introspection_secret: Annotated[str | None, Header()] = None,
+) -> None:
+    """Проверяем секрет шлюза для интроспекции токенов."""
+    if not (
+            settings.INTROSPECTION_SECRET
+            and x_introspection_secret
+            and hmac.compare_digest(x_introspection_secret.encode(), settings.INTROSPECTION_SECRET.encode())
+    ):
+        raise ForbiddenException()
+
+
+async def check_login_rate_limit(
+        request: Request,
+        form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+) -> None:
+    """Проверяем лимит попыток входа по IP-адресу и логину."""
+    await login_rate_limiter.check(
+        client_ip=get_client_ip(request),
+        username=form_data.username,
+    )
+
+
+def get_token_payload(token: str) -> dict:
+    """Проверяем подпись и срок действия токена и возвращаем его полезную нагрузку."""
     try:
         payload = token_service.decode_token(token)
     except ExpiredSignatureError:
@@ -90,22 +125,48 @@ async def get_current_user(
     if (not expire) or (expire_time < datetime.now(timezone.utc)):
         raise TokenExpiredException()
 
-    user_id: str = payload.get('sub')
-    if not user_id:
+    if not payload.get('sub'):
         raise NoUserIdException()
+    return payload
+
+
+async def get_current_user(
+        token: Annotated[str, Depends(oauth2_scheme)],
+        db_session: AsyncSession = Depends(get_session_without_commit),
+        client_fingerprint: str = Depends(get_client_fingerprint),
+        token_type: str = "access",
+) -> User | SUserPrincipal:
+    """Проверяем access_token и возвращаем пользователя."""    
+    payload = get_token_payload(token)
+    user_id: str = payload['sub']
     
-    if not await token_service.verify_token(token, user_id, token_type, client_fingerprint):
+    if not await token_service.verify_token(token, user_id, token_type, client_fingerprint, payload):
         raise NoSessionJwtException()
 
+    if settings.TOKEN_EMBED_CLAIMS and token_type == "access" and "role_id" in payload:
+        # Пользователь восстанавливается из утверждений токена без запроса к БД
+        return get_principal_from_payload(payload)
+
     user = await UsersDAO(db_session).find_one_or_none_by_id(data_id=int(user_id))
     if not user:
         raise UserNotFoundException()
     return user
 
 
+def get_principal_from_payload(payload: dict) -> SUserPrincipal:
+    """Собираем пользователя из утверждений токена доступа."""
+    return SUserPrincipal(
+        id=int(payload["sub"]),
+        username=payload["username"],
+        first_name=payload["first_name"],
+        last_name=payload["last_name"],
+        role=RoleModel(id=payload["role_id"], name=payload["role_name"]),
+    )
+
+
 async def get_current_admin_user(
-        current_user: User = Depends(get_current_user)
-) -> User:
+        current_user: User | SUserPrincipal = Depends(get_current_user)
+) -> User | SUserPrincipal:
     """Проверяем права пользователя как администратора."""
     if current_user.role_id > 3:
         return current_user
@@ -113,8 +174,8 @@ async def get_current_admin_user(
 
 
 async def get_current_superadmin_user(
-        current_user: User = Depends(get_current_user)
-) -> User:
+        current_user: User | SUserPrincipal = Depends(get_current_user)
+) -> User | SUserPrincipal:
     """Проверяем права пользователя как администратора."""
     if current_user.role_id == 4:
         return current_user
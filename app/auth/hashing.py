@@ -0,0 +1,229 @@
+import asyncio
+import secrets
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Literal
+
+from loguru import logger
+from passlib.context import CryptContext
+from passlib.hash import argon2
+
+from app.config import settings
+from app.exceptions import PasswordHashQueueFullException
+from app.metrics import metrics
+
+
+# Минимально и максимально допустимая стоимость при калибровке
+MIN_ROUNDS = {'bcrypt': 10, 'argon2': 2}
+MAX_ROUNDS = {'bcrypt': 16, 'argon2': 10}
+
+
+@lru_cache(maxsize=8)
+def _get_context(context_config: str) -> CryptContext:
+    """Получить CryptContext по его сериализованной конфигурации (кешируется в каждом воркере)"""
+    return CryptContext.from_string(context_config)
+
+
+def hash_password(context_config: str, password: str) -> str:
+    """Получить хеш пароля (выполняется в пуле)"""
+    return _get_context(context_config).hash(password)
+
+
+def verify_password(context_config: str, plain_password: str, hashed_password: str) -> bool:
+    """Проверить пароль (выполняется в пуле)"""
+    return _get_context(context_config).verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(
+        context_config: str,
+        plain_password: str,
+        hashed_password: str,
+) -> tuple[bool, str | None]:
+    """Проверить пароль и при устаревших параметрах хеша получить новый хеш (выполняется в пуле)"""
+    return _get_context(context_config).verify_and_update(plain_password, hashed_password)
+
+
+def build_crypt_context(
+        scheme: Literal['bcrypt', 'argon2'],
+        rounds: int | None = None,
+        pin_rounds: bool = True,
+) -> CryptContext:
+    """
+    Создать CryptContext с заданными параметрами стоимости
+
+    Хеши других схем остаются проверяемыми и помечаются устаревшими.
+    Хеши той же схемы считаются устаревшими, если их стоимость ниже заданной,
+    а при pin_rounds - и если выше (например, при намеренном снижении стоимости).
+
+    Args:
+        scheme: Схема хеширования по умолчанию
+        rounds: Стоимость (cost для bcrypt, time_cost для argon2id), None - по умолчанию passlib
+        pin_rounds: Считать устаревшими и хеши с большей стоимостью
+    """
+    if scheme == 'argon2' and not argon2.has_backend():
+        raise RuntimeError("Для схемы argon2 требуется установить пакет argon2-cffi")
+
+    schemes = [scheme] + [s for s in ('bcrypt', 'argon2') if s != scheme]
+    if not argon2.has_backend():
+        schemes.remove('argon2')
+
+    options: dict[str, Any] = {}
+    if scheme == 'argon2':
+        options.update(
+            argon2__type='ID',
+            argon2__memory_cost=settings.PASSWORD_HASH_ARGON2_MEMORY_COST,
+            argon2__parallelism=settings.PASSWORD_HASH_ARGON2_PARALLELISM,
+        )
+    if rounds is not None:
+        options[f'{scheme}__default_rounds'] = rounds
+        options[f'{scheme}__min_rounds'] = rounds
+        if pin_rounds:
+            options[f'{scheme}__max_rounds'] = rounds
+
+    return CryptContext(schemes=schemes, deprecated="auto", **options)
+
+
+def calibrate_rounds(
+        scheme: Literal['bcrypt', 'argon2'],
+        target_ms: int,
+) -> int:
+    """
+    Подобрать стоимость хеширования под бюджет задержки на текущем железе
+
+    Возвращает наибольшую стоимость, при которой одно хеширование укладывается
+    в target_ms, но не ниже минимально допустимой для схемы.
+
+    Args:
+        scheme: Схема хеширования
+        target_ms: Бюджет задержки одного хеширования в миллисекундах
+    """
+    rounds = MIN_ROUNDS[scheme]
+    elapsed = _measure_hash(scheme, rounds)
+
+    while True:
+        # Для bcrypt время удваивается с каждым шагом, для argon2 растет линейно
+        if scheme == 'bcrypt':
+            estimated = elapsed * 2
+        else:
+            estimated = elapsed * (rounds + 1) / rounds
+        if estimated > target_ms / 1000 or rounds >= MAX_ROUNDS[scheme]:
+            break
+
+        measured = _measure_hash(scheme, rounds + 1)
+        if measured > target_ms / 1000:
+            break
+        rounds, elapsed = rounds + 1, measured
+
+    logger.info(f"Калибровка {scheme}: стоимость {rounds}, {elapsed * 1000:.0f} мс на хеш")
+    return rounds
+
+
+def _measure_hash(scheme: Literal['bcrypt', 'argon2'], rounds: int) -> float:
+    """Измерить время хеширования с заданной стоимостью, в секундах"""
+    context = build_crypt_context(scheme, rounds)
+    password = secrets.token_urlsafe(16)
+    started_at = time.perf_counter()
+    context.hash(password)
+    return time.perf_counter() - started_at
+
+
+class PasswordHashExecutor:
+    """
+    Пул для выполнения хеширования паролей вне event loop
+
+    Ограничивает число одновременно выполняемых операций и длину очереди ожидания.
+    При переполнении очереди запрос отклоняется сразу, не дожидаясь освобождения пула.
+    """
+
+    def __init__(
+            self,
+            executor_type: Literal['thread', 'process'],
+            max_workers: int,
+            max_queue: int,
+    ):
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+
+        self._executor: Executor | None = None
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self._active = 0
+        self._queued = 0
+
+        metrics.describe("password_hash_active", "Число выполняемых операций хеширования")
+        metrics.describe("password_hash_queued", "Число операций хеширования в очереди")
+        metrics.describe("password_hash_rejected_total", "Число отклоненных из-за переполнения очереди операций")
+        metrics.register_gauge("password_hash_active", lambda: self._active)
+        metrics.register_gauge("password_hash_queued", lambda: self._queued)
+
+    def _get_executor(self) -> Executor:
+        """Получить пул, создав его при первом обращении"""
+        if self._executor is None:
+            if self.executor_type == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="password-hash",
+                )
+            logger.info(f"Создан пул хеширования паролей: {self.executor_type}, воркеров: {self.max_workers}")
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Выполнить функцию в пуле
+
+        Args:
+            func: Функция уровня модуля (должна сериализоваться для пула процессов)
+            args: Аргументы функции
+        """
+        if self._active >= self.max_workers and self._queued >= self.max_queue:
+            metrics.inc("password_hash_rejected_total")
+            raise PasswordHashQueueFullException()
+
+        self._queued += 1
+        queued_at = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._queued -= 1
+
+        self._active += 1
+        started_at = time.perf_counter()
+        metrics.observe("password_hash_wait_seconds", started_at - queued_at)
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._release(started_at)
+            raise
+
+        # Слот освобождается по завершении операции в пуле, а не при отмене ожидающего запроса:
+        # иначе отмененные запросы позволяли бы выполнять больше операций, чем max_workers
+        future.add_done_callback(lambda _: self._release_threadsafe(loop, started_at))
+        return await asyncio.wrap_future(future)
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop, started_at: float) -> None:
+        """Освободить слот из потока пула"""
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(self._release, started_at)
+
+    def _release(self, started_at: float) -> None:
+        """Освободить слот пула после завершения операции"""
+        self._active -= 1
+        self._semaphore.release()
+        metrics.observe("password_hash_duration_seconds", time.perf_counter() - started_at)
+
+    def shutdown(self) -> None:
+        """Остановить пул"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+if __name__ == '__main__':
+    # Калибровка из командной строки: python -m app.auth.hashing
+    calibrated = calibrate_rounds(settings.PASSWORD_HASH_SCHEME, settings.PASSWORD_HASH_TARGET_MS)
+    print(f"PASSWORD_HASH_SCHEME={settings.PASSWORD_HASH_SCHEME}")
+    print(f"PASSWORD_HASH_ROUNDS={calibrated}")
@@ -0,0 +1,197 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwk
+from jose.backends.base import Key
+from loguru import logger
+
+
+# Асимметричные алгоритмы подписи, для которых используется связка ключей
+ASYMMETRIC_ALGORITHMS = ('RS256', 'ES256')
+
+
+class SigningKey:
+    """Ключ подписи из связки"""
+
+    def __init__(self, kid: str, algorithm: str, private_pem: bytes, created_at: datetime, published_at: datetime):
+        self.kid = kid
+        self.created_at = created_at
+        self.published_at = published_at
+        self.private_key: Key = jwk.construct(private_pem, algorithm)
+        self.public_key: Key = self.private_key.public_key()
+
+    def to_jwk(self) -> dict:
+        """Публичная часть ключа в формате JWK"""
+        return {
+            **self.public_key.to_dict(),
+            'kid': self.kid,
+            'use': 'sig',
+        }
+
+
+class KeyRing:
+    """
+    Связка ключей для асимметричной подписи токенов
+
+    Ключи хранятся в каталоге в виде PEM-файлов `<kid>.pem` и общие для всех воркеров.
+    Идентификатор ключа вычисляется из номера периода ротации, поэтому воркеры,
+    одновременно обнаружившие необходимость ротации, создают один и тот же ключ,
+    и только один из них успевает его записать.
+    Старые ключи хранятся, пока подписанными ими токенами еще можно пользоваться.
+
+    Ключ следующего периода создается заранее и публикуется в JWKS, а подписывать
+    им начинают, только когда все воркеры успели его загрузить и истек срок
+    кеширования JWKS у других сервисов (publish_delay). Поэтому сервисы,
+    закешировавшие JWKS, знают ключ любого нового токена.
+
+    Чтение и создание ключей выполняются только в фоновой задаче (run_rotation);
+    обработчики запросов читают связку из памяти.
+    """
+
+    def __init__(
+            self,
+            algorithm: str,
+            keys_dir: str,
+            rotation_interval: timedelta,
+            retention: timedelta,
+            reload_interval: int,
+            jwks_max_age: int,
+    ):
+        self.algorithm = algorithm
+        self.keys_dir = Path(keys_dir)
+        self.rotation_interval = rotation_interval
+        self.retention = retention
+        self.reload_interval = reload_interval
+        # Время, за которое новый ключ загружают все воркеры и истекают закешированные JWKS
+        self.publish_delay = timedelta(seconds=jwks_max_age + reload_interval)
+
+        self._keys: dict[str, SigningKey] = {}
+        self._active: SigningKey | None = None
+
+    def _period(self, now: datetime) -> int:
+        """Получить номер периода ротации"""
+        return int(now.timestamp() // self.rotation_interval.total_seconds())
+
+    def _kid(self, period: int) -> str:
+        """Получить идентификатор ключа периода ротации"""
+        return f"{self.algorithm.lower()}-{period}"
+
+    def _current_kid(self, now: datetime) -> str:
+        """Получить идентификатор ключа текущего периода ротации"""
+        return self._kid(self._period(now))
+
+    def _generate_private_pem(self) -> bytes:
+        """Сгенерировать закрытый ключ для алгоритма связки"""
+        if self.algorithm == 'RS256':
+            private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        else:
+            private_key = ec.generate_private_key(ec.SECP256R1())
+        return private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+
+    def _write_key(self, kid: str) -> None:
+        """Атомарно записать новый ключ, если другой воркер еще не успел"""
+        self.keys_dir.mkdir(parents=True, exist_ok=True)
+        path = self.keys_dir / f"{kid}.pem"
+        tmp_path = self.keys_dir / f".{kid}.{os.getpid()}.tmp"
+
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self._generate_private_pem())
+        try:
+            os.link(tmp_path, path)
+            logger.info(f"Создан ключ подписи {kid}")
+        except FileExistsError:
+            pass
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def load(self) -> None:
+        """Загрузить ключи из каталога, удалив устаревшие"""
+        now = datetime.now(timezone.utc)
+        keys = {}
+        for path in self.keys_dir.glob(f"{self.algorithm.lower()}-*.pem"):
+            kid = path.stem
+            period = int(kid.rsplit('-', 1)[1])
+            created_at = datetime.fromtimestamp(period * self.rotation_interval.total_seconds(), tz=timezone.utc)
+
+            if created_at + self.rotation_interval + self.retention < now:
+                path.unlink(missing_ok=True)
+                logger.info(f"Удален устаревший ключ подписи {kid}")
+                continue
+
+            key = self._keys.get(kid)
+            if key is None:
+                # Время записи файла - момент, с которого воркеры начинают публиковать ключ
+                published_at = datetime.fromtimestamp(path.stat().st_mtime, tz=timezone.utc)
+                key = SigningKey(kid, self.algorithm, path.read_bytes(), created_at, published_at)
+            keys[kid] = key
+
+        self._keys = keys
+        self._active = self._select_active(now)
+
+    def _select_active(self, now: datetime) -> SigningKey | None:
+        """
+        Выбрать ключ подписи
+
+        Используется самый новый ключ, опубликованный дольше publish_delay.
+        При первом запуске таких ключей нет, и используется ключ текущего периода.
+        """
+        published = [key for key in self._keys.values() if key.published_at + self.publish_delay <= now]
+        candidates = published or [key for key in self._keys.values() if key.created_at <= now]
+        return max(candidates, key=lambda k: k.created_at, default=None)
+
+    def rotate_if_due(self) -> None:
+        """
+        Создать ключи текущего и (заранее) следующего периода и перезагрузить связку
+        """
+        now = datetime.now(timezone.utc)
+        period = self._period(now)
+        kids = [self._kid(period)]
+        next_period_start = datetime.fromtimestamp(
+            (period + 1) * self.rotation_interval.total_seconds(), tz=timezone.utc
+        )
+        if now >= next_period_start - self.publish_delay:
+            kids.append(self._kid(period + 1))
+
+        for kid in kids:
+            if not (self.keys_dir / f"{kid}.pem").exists():
+                self._write_key(kid)
+        self.load()
+
+    @property
+    def active(self) -> SigningKey:
+        """Ключ, которым подписываются новые токены"""
+        if self._active is None:
+            raise RuntimeError("Связка ключей подписи не загружена")
+        return self._active
+
+    def get_verification_key(self, kid: str) -> Key | None:
+        """
+        Получить публичный ключ по идентификатору
+
+        Ключ подписи начинает использоваться после загрузки всеми воркерами,
+        поэтому неизвестный kid не требует перечитывания каталога.
+        """
+        key = self._keys.get(kid)
+        return key.public_key if key else None
+
+    def jwks(self) -> dict:
+        """Публичные ключи связки в формате JWKS, включая еще не используемый ключ следующего периода"""
+        return {'keys': [key.to_jwk() for key in self._keys.values()]}
+
+    async def run_rotation(self) -> None:
+        """Периодически выполнять ротацию и перезагрузку ключей (первая загрузка - при запуске)"""
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await asyncio.to_thread(self.rotate_if_due)
+            except Exception as e:
+                logger.error(f"Ошибка ротации ключей подписи: {e}")
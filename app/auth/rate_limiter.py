@@ -0,0 +1,190 @@
+import hashlib
+import math
+import secrets
+import time
+from collections import deque
+
+from loguru import logger
+from redis.exceptions import RedisError
+
+from app.auth.redis_manager import RedisTokenManager
+from app.config import settings
+from app.exceptions import TooManyRequestsException
+from app.metrics import metrics
+
+
+# Скользящее окно на сортированных множествах: попытка учитывается только если
+# не превышен ни один из лимитов. Возвращает время ожидания (мс) для каждого ключа.
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local member = ARGV[3]
+local waits = {}
+local rejected = false
+
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    local wait = 0
+    if redis.call('ZCARD', key) >= tonumber(ARGV[3 + i]) then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        wait = tonumber(oldest[2]) + window - now
+        rejected = true
+    end
+    waits[i] = wait
+end
+
+if not rejected then
+    for _, key in ipairs(KEYS) do
+        redis.call('ZADD', key, now, member)
+        redis.call('PEXPIRE', key, window)
+    end
+end
+
+return waits
+"""
+
+
+class LoginRateLimiter:
+    """
+    Ограничение числа попыток входа по IP-адресу и логину
+
+    Счетчики хранятся в Redis (скользящее окно). Ключи, по которым Redis уже
+    отказал, запоминаются локально до истечения блокировки, поэтому повторные
+    попытки отклоняются без обращения к Redis, базе данных и bcrypt.
+    Если Redis не используется (redis_manager не задан), скользящее окно
+    ведется в памяти процесса.
+    """
+
+    # Общий hash tag: в Redis Cluster оба счетчика проверяются одним скриптом в одном слоте
+    key_prefix = "{login_attempts}"
+    max_local_entries = 10000
+
+    def __init__(self, redis_manager: RedisTokenManager | None):
+        self.redis_manager = redis_manager
+        self._script = None
+        self._blocked_until: dict[str, float] = {}
+        self._attempts: dict[str, deque[int]] = {}
+
+        metrics.describe("login_rate_limit_rejected_total", "Число отклоненных попыток входа")
+        metrics.describe("login_rate_limit_local_rejected_total", "Число попыток входа, отклоненных без обращения к Redis")
+
+    def _get_keys(self, client_ip: str | None, username: str) -> dict[str, int]:
+        """
+        Получить ключи счетчиков для IP-адреса и логина с их лимитами
+
+        Если IP-адрес клиента неизвестен, учитывается только лимит по логину.
+        """
+        username_digest = hashlib.sha256(username.encode()).hexdigest()[:32]
+        keys = {}
+        if client_ip:
+            keys[f"{self.key_prefix}:ip:{client_ip}"] = settings.LOGIN_RATE_LIMIT_PER_IP
+        keys[f"{self.key_prefix}:user:{username_digest}"] = settings.LOGIN_RATE_LIMIT_PER_USERNAME
+        return keys
+
+    def _get_script(self):
+        """Получить зарегистрированный скрипт для текущего клиента Redis"""
+        client = self.redis_manager.redis_client
+        if self._script is None or self._script.registered_client is not client:
+            self._script = client.register_script(SLIDING_WINDOW_SCRIPT)
+        return self._script
+
+    def _check_local(self, keys: list[str]) -> float:
+        """Получить оставшееся время локальной блокировки в секундах"""
+        now = time.monotonic()
+        wait = 0.0
+        for key in keys:
+            blocked_until = self._blocked_until.get(key)
+            if blocked_until is None:
+                continue
+            if blocked_until <= now:
+                del self._blocked_until[key]
+                continue
+            wait = max(wait, blocked_until - now)
+        return wait
+
+    def _block_local(self, key: str, wait: float) -> None:
+        """Запомнить блокировку ключа локально"""
+        if len(self._blocked_until) >= self.max_local_entries:
+            now = time.monotonic()
+            self._blocked_until = {k: v for k, v in self._blocked_until.items() if v > now}
+            if len(self._blocked_until) >= self.max_local_entries:
+                return
+        self._blocked_until[key] = time.monotonic() + wait
+
+    async def _count_attempt_redis(self, keys: list[str], now_ms: int, limits: list[int]) -> list[int] | None:
+        """Учесть попытку в скользящем окне в Redis, None - Redis недоступен"""
+        try:
+            return await self._get_script()(
+                keys=keys,
+                args=[
+                    now_ms,
+                    settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS * 1000,
+                    f"{now_ms}-{secrets.token_hex(4)}",
+                    *limits,
+                ],
+            )
+        except RedisError as e:
+            # Недоступность Redis не должна блокировать вход
+            logger.warning(f"Не удалось проверить лимит попыток входа: {e}")
+            return None
+
+    def _count_attempt_local(self, keys: list[str], now_ms: int, limits: list[int]) -> list[int]:
+        """Учесть попытку в скользящем окне в памяти процесса (аналог SLIDING_WINDOW_SCRIPT)"""
+        window = settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS * 1000
+        if len(self._attempts) >= self.max_local_entries:
+            self._attempts = {
+                key: attempts for key, attempts in self._attempts.items()
+                if attempts and attempts[-1] > now_ms - window
+            }
+
+        waits = []
+        for key, limit in zip(keys, limits):
+            attempts = self._attempts.setdefault(key, deque())
+            while attempts and attempts[0] <= now_ms - window:
+                attempts.popleft()
+            waits.append(attempts[0] + window - now_ms if len(attempts) >= limit else 0)
+
+        if not any(waits):
+            for key in keys:
+                self._attempts[key].append(now_ms)
+        return waits
+
+    async def check(self, client_ip: str | None, username: str) -> None:
+        """
+        Учесть попытку входа или отклонить ее при превышении лимита
+
+        Args:
+            client_ip: IP-адрес клиента, None - неизвестен
+            username: Логин из формы входа
+        """
+        if not settings.LOGIN_RATE_LIMIT_ENABLED:
+            return
+
+        key_limits = self._get_keys(client_ip, username)
+        keys = list(key_limits)
+
+        wait = self._check_local(keys)
+        if wait > 0:
+            metrics.inc("login_rate_limit_local_rejected_total")
+            raise TooManyRequestsException(headers={'Retry-After': str(math.ceil(wait))})
+
+        now_ms = int(time.time() * 1000)
+        limits = list(key_limits.values())
+        if self.redis_manager is None:
+            waits = self._count_attempt_local(keys, now_ms, limits)
+        else:
+            waits = await self._count_attempt_redis(keys, now_ms, limits)
+        if waits is None:
+            return
+
+        wait = 0.0
+        for key, key_wait_ms in zip(keys, waits):
+            if int(key_wait_ms) > 0:
+                key_wait = int(key_wait_ms) / 1000
+                self._block_local(key, key_wait)
+                wait = max(wait, key_wait)
+
+        if wait > 0:
+            metrics.inc("login_rate_limit_rejected_total")
+            logger.warning(f"Превышен лимит попыток входа: IP {client_ip}, логин {username}")
+            raise TooManyRequestsException(headers={'Retry-After': str(math.ceil(wait))})
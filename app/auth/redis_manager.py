@@ -1,39 +1,341 @@
-from redis.asyncio import Redis
+import asyncio
+import hashlib
+import hmac
+import time
+from typing import Literal
 
-from app.dao.database import REDIS_URL
+from loguru import logger
+from redis.asyncio import Redis, RedisCluster
+from redis.exceptions import RedisError
+
+from app.auth.token_cache import TokenNearCache
+from app.config import settings
+from app.dao.redis import redis_client_manager, wait_for_replicas
+from app.metrics import metrics
+
+
+# Удаление всех сессий пользователя за один запрос: ключи берутся из индекса
+# сессий (KEYS[1]) и удаляются вместе с ним. Возвращает удаленные ключи сессий.
+# Обращается к ключам, не переданным в KEYS, поэтому не используется в Redis Cluster.
+INVALIDATE_ALL_SCRIPT = """
+local fingerprints = redis.call('ZRANGE', KEYS[1], 0, -1)
+local keys = {}
+
+for _, fingerprint in ipairs(fingerprints) do
+    local key = ARGV[1] .. fingerprint
+    table.insert(keys, key)
+    redis.call('UNLINK', key)
+    if ARGV[2] ~= '' then
+        redis.call('PUBLISH', ARGV[2], key)
+    end
+end
+redis.call('UNLINK', KEYS[1])
+
+return keys
+"""
+
+# Сохранение дайджестов токенов сессии. KEYS: запись сессии, индекс сессий.
+# ARGV: время жизни, текущее время, сокращенный отпечаток клиента, канал инвалидации,
+# число n сохраняемых полей, n пар поле-дайджест, затем удаляемые поля.
+STORE_SCRIPT = """
+local ttl = tonumber(ARGV[1])
+local now = tonumber(ARGV[2])
+local last_field = 5 + tonumber(ARGV[5]) * 2
+
+if last_field > 5 then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 6, last_field))
+end
+if #ARGV > last_field then
+    redis.call('HDEL', KEYS[1], unpack(ARGV, last_field + 1, #ARGV))
+end
+
+-- Запись и индекс живут до истечения самого долгоживущего токена
+for _, key in ipairs(KEYS) do
+    redis.call('EXPIRE', key, ttl, 'NX')
+    redis.call('EXPIRE', key, ttl, 'GT')
+end
+redis.call('ZADD', KEYS[2], 'GT', now + ttl, ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+
+if ARGV[4] ~= '' then
+    redis.call('PUBLISH', ARGV[4], KEYS[1])
+end
+return 1
+"""
+
+# Удаление токена сессии. KEYS: запись сессии. ARGV: поле токена, канал инвалидации.
+INVALIDATE_TOKEN_SCRIPT = """
+redis.call('HDEL', KEYS[1], ARGV[1])
+if ARGV[2] ~= '' then
+    redis.call('PUBLISH', ARGV[2], KEYS[1])
+end
+return 1
+"""
+
+# Удаление сессии. KEYS: запись сессии, индекс сессий.
+# ARGV: сокращенный отпечаток клиента, канал инвалидации.
+INVALIDATE_SESSION_SCRIPT = """
+redis.call('UNLINK', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+if ARGV[2] ~= '' then
+    redis.call('PUBLISH', ARGV[2], KEYS[1])
+end
+return 1
+"""
+
+# Ротация refresh-токена: новая пара сохраняется, только если в сессии хранится
+# дайджест предъявленного refresh-токена; замененный дайджест сохраняется в поле p.
+# KEYS: запись сессии, индекс сессий. Возвращает 1 - токены заменены,
+# 0 - предъявлен предыдущий (уже замененный) refresh-токен сессии,
+# -1 - сессии нет или токен ей не выдавался.
+ROTATE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'r')
+if not current then
+    return -1
+end
+if current ~= ARGV[1] then
+    if redis.call('HGET', KEYS[1], 'p') == ARGV[1] then
+        return 0
+    end
+    return -1
+end
+
+local refresh_ttl = tonumber(ARGV[4])
+redis.call('HSET', KEYS[1], 'r', ARGV[3], 'p', current)
+if ARGV[2] ~= '' then
+    redis.call('HSET', KEYS[1], 'a', ARGV[2])
+else
+    redis.call('HDEL', KEYS[1], 'a')
+end
+redis.call('EXPIRE', KEYS[1], refresh_ttl)
+
+local now = tonumber(ARGV[6])
+redis.call('ZADD', KEYS[2], 'GT', now + refresh_ttl, ARGV[5])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+redis.call('EXPIRE', KEYS[2], refresh_ttl, 'NX')
+redis.call('EXPIRE', KEYS[2], refresh_ttl, 'GT')
+
+if ARGV[7] ~= '' then
+    redis.call('PUBLISH', ARGV[7], KEYS[1])
+end
+
+return 1
+"""
 
 
 class RedisTokenManager:
-    """Класс для работы с Redis"""
+    """
+    Класс для работы с Redis
+
+    Каждая сессия (пользователь и отпечаток клиента) хранится одним hash
+    `ts:{subject}:{fingerprint}` с полями `a` и `r` - 16-байтными дайджестами
+    токенов доступа и обновления, и `p` - дайджестом refresh-токена,
+    замененного при последней ротации. Отпечаток клиента в ключах сокращается
+    до 16 байт SHA-256. Срок действия токенов проверяется по полю exp
+    самого JWT, поэтому запись живет столько же, сколько refresh-токен.
+
+    Идентификатор пользователя в ключах - hash tag `{subject}`, поэтому в
+    Redis Cluster все данные пользователя находятся в одном слоте, и операции
+    над парой токенов и всеми сессиями пользователя выполняются на одном узле.
+    """
 
     access_token_prefix = "access"
     refresh_token_prefix = "refresh"
-    
+    token_fields = {access_token_prefix: b"a", refresh_token_prefix: b"r"}
+    previous_refresh_field = b"p"
+    session_prefix = b"ts"
+    sessions_prefix = b"tsi"
+    epoch_prefix = b"epoch"
+    invalidation_channel = "token_invalidations"
+
     def __init__(self):
-        self.redis_client = Redis.from_url(
-            url=REDIS_URL,
-            decode_responses=True,
+        self._redis_client: Redis | None = None
+        self._replica_client: Redis | None = None
+        self.near_cache = TokenNearCache(
+            ttl=settings.TOKEN_NEAR_CACHE_TTL_SECONDS,
+            max_size=settings.TOKEN_NEAR_CACHE_MAX_SIZE,
+        ) if settings.TOKEN_NEAR_CACHE_ENABLED else None
+        self._scripts = {}
+
+        metrics.describe(
+            "redis_replica_wait_timeouts_total",
+            "Число записей сессий, не подтвержденных всеми репликами Redis за REDIS_REPLICA_WAIT_TIMEOUT_MS",
         )
-    
-    def _get_token_key(
+
+    @property
+    def redis_client(self) -> Redis | RedisCluster:
+        """Клиент Redis: общий клиент приложения, если не задан явно (например, в тестах)"""
+        if self._redis_client is not None:
+            return self._redis_client
+        return redis_client_manager.client
+
+    @redis_client.setter
+    def redis_client(self, client: Redis | RedisCluster) -> None:
+        self._redis_client = client
+
+    @property
+    def replica_client(self) -> Redis | None:
+        """Клиент реплики для чтения или None, если реплики не настроены"""
+        if self._replica_client is not None:
+            return self._replica_client
+        return redis_client_manager.replica_client
+
+    @replica_client.setter
+    def replica_client(self, client: Redis | None) -> None:
+        self._replica_client = client
+
+    def _get_script(self, source: str):
+        """Получить скрипт, зарегистрированный в текущем клиенте Redis"""
+        client = self.redis_client
+        script = self._scripts.get(source)
+        if script is None or script.registered_client is not client:
+            script = self._scripts[source] = client.register_script(source)
+        return script
+
+    async def _run_write_script(self, source: str, keys: list, args: list):
+        """
+        Выполнить скрипт записи сессий
+
+        Если токены проверяются на репликах, после скрипта в том же соединении
+        выполняется WAIT. Поэтому когда отзыв или ротация завершены, отозванный
+        токен уже не принимается ни одним воркером, читающим с подтвердивших реплик.
+        Ожидание не повторяет запись: неподтвержденная запись только учитывается
+        в метрике redis_replica_wait_timeouts_total.
+        """
+        script = self._get_script(source)
+        wait_count = redis_client_manager.replica_wait_count
+        if not wait_count:
+            return await script(keys=keys, args=args)
+
+        # WAIT учитывает записи своего соединения, поэтому скрипт и WAIT выполняются в одном
+        connection_client = self.redis_client.client()
+        try:
+            result = await script(keys=keys, args=args, client=connection_client)
+            await wait_for_replicas(connection_client, wait_count, settings.REDIS_REPLICA_WAIT_TIMEOUT_MS)
+        finally:
+            await connection_client.aclose()
+        return result
+
+    @property
+    def cluster_mode(self) -> bool:
+        """Работает ли менеджер с Redis Cluster"""
+        return isinstance(self.redis_client, RedisCluster)
+
+    @staticmethod
+    def _get_hash_tag(subject: int | str) -> bytes:
+        """Получить hash tag пользователя для размещения его ключей в одном слоте"""
+        return b"{%s}" % str(subject).encode()
+
+    @staticmethod
+    def token_digest(token: str) -> bytes:
+        """Получить 16-байтный дайджест токена"""
+        return hashlib.sha256(token.encode()).digest()[:16]
+
+    @staticmethod
+    def _pack_fingerprint(client_fingerprint: str) -> bytes:
+        """Сократить отпечаток клиента до 16 байт"""
+        return hashlib.sha256(client_fingerprint.encode()).digest()[:16]
+
+    @classmethod
+    def session_id(cls, client_fingerprint: str) -> str:
+        """Получить идентификатор сессии, под которым она возвращается list_user_sessions"""
+        return cls._pack_fingerprint(client_fingerprint).hex()
+
+    def _get_session_prefix(self, subject: int | str) -> bytes:
+        """Получить общий префикс ключей сессий пользователя"""
+        return b"%s:%s:" % (self.session_prefix, self._get_hash_tag(subject))
+
+    def _get_session_key(
             self,
             subject: int | str,
-            token_type: str,
             client_fingerprint: str,
-    ) -> str:
-        """Получить ключ для токена"""
-        return f"{token_type}:{subject}:{client_fingerprint}"
+    ) -> bytes:
+        """Получить ключ записи сессии"""
+        return self._get_session_prefix(subject) + self._pack_fingerprint(client_fingerprint)
+
+    def _get_sessions_key(self, subject: int | str) -> bytes:
+        """
+        Получить ключ индекса сессий пользователя
+
+        Индекс - sorted set сокращенных отпечатков клиентов со временем
+        истечения записи сессии в качестве score.
+        """
+        return b"%s:%s" % (self.sessions_prefix, self._get_hash_tag(subject))
 
-    async def _get_user_tokens(
+    @property
+    def _invalidation_channel(self) -> str:
+        """Канал оповещения воркеров об изменении ключей ("" - оповещение не нужно)"""
+        return self.invalidation_channel if self.near_cache is not None else ""
+
+    def _invalidate_local(self, keys: list[bytes]) -> None:
+        """Удалить ключи из локального кеша текущего воркера"""
+        if self.near_cache is not None:
+            for key in keys:
+                self.near_cache.invalidate(key)
+
+    async def list_user_sessions(
             self,
             subject: int | str,
-    ) -> list[str]:
-        """Получить все токены для пользователя"""
-        tokens = []
-        for token_type in (self.access_token_prefix, self.refresh_token_prefix):
-            token_type_keys = await self.redis_client.keys(f"{token_type}:{subject}:*")
-            tokens.extend(token_type_keys)
-        return tokens
+    ) -> dict[str, float]:
+        """
+        Получить активные сессии пользователя
+
+        Returns:
+            Идентификаторы сессий (см. session_id) и время их истечения (unix time)
+        """
+        sessions_key = self._get_sessions_key(subject)
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(sessions_key, "-inf", time.time())
+            pipe.zrange(sessions_key, 0, -1, withscores=True)
+            _, sessions = await pipe.execute()
+        return {fingerprint.hex(): expire for fingerprint, expire in sessions}
+
+    async def _store_tokens(
+            self,
+            subject: int | str,
+            client_fingerprint: str,
+            tokens: dict[str, str | None],
+            expire_time: int,
+    ):
+        """
+        Сохранить дайджесты токенов сессии одним скриптом
+
+        Args:
+            subject: Пользователь
+            client_fingerprint: Отпечаток клиента
+            tokens: Токены по типам, None - удалить токен этого типа
+            expire_time: Время жизни самого долгоживущего токена (секунды)
+        """
+        key = self._get_session_key(subject, client_fingerprint)
+
+        digests = {
+            self.token_fields[token_type]: self.token_digest(token)
+            for token_type, token in tokens.items()
+            if token is not None
+        }
+        removed_fields = [
+            self.token_fields[token_type]
+            for token_type, token in tokens.items()
+            if token is None
+        ]
+        # Новый refresh-токен начинает новую цепочку ротаций
+        if tokens.get(self.refresh_token_prefix) is not None:
+            removed_fields.append(self.previous_refresh_field)
+
+        await self._run_write_script(
+            STORE_SCRIPT,
+            keys=[key, self._get_sessions_key(subject)],
+            args=[
+                expire_time,
+                time.time(),
+                self._pack_fingerprint(client_fingerprint),
+                self._invalidation_channel,
+                len(digests),
+                *[value for item in digests.items() for value in item],
+                *removed_fields,
+            ],
+        )
+        self._invalidate_local([key])
 
     async def store_token(
             self,
@@ -44,18 +346,106 @@ class RedisTokenManager:
             client_fingerprint: str,
     ):
         """Сохранить токен в Redis с истечением времени"""
-        key = self._get_token_key(subject, token_type, client_fingerprint)
-        await self.redis_client.set(key, token, ex=expire_time)
+        await self._store_tokens(subject, client_fingerprint, {token_type: token}, expire_time)
 
-    async def get_token(
+    async def store_token_pair(
+            self,
+            subject: int | str,
+            access_token: str | None,
+            refresh_token: str,
+            refresh_expire_time: int,
+            client_fingerprint: str,
+    ):
+        """
+        Сохранить пару токенов за один запрос к Redis
+
+        Если access_token не указан, сохраняется только refresh-токен.
+        """
+        await self._store_tokens(
+            subject,
+            client_fingerprint,
+            {self.access_token_prefix: access_token, self.refresh_token_prefix: refresh_token},
+            refresh_expire_time,
+        )
+
+    async def _get_session(
+            self,
+            subject: int | str,
+            client_fingerprint: str,
+            replica_client: Redis | None = None,
+    ) -> dict[bytes, bytes]:
+        """
+        Получить запись сессии, используя локальный кеш
+
+        Args:
+            subject: Пользователь
+            client_fingerprint: Отпечаток клиента
+            replica_client: Реплика для чтения, None - читать с основного узла
+        """
+        key = self._get_session_key(subject, client_fingerprint)
+        client = replica_client or self.redis_client
+        if self.near_cache is None:
+            return await client.hgetall(key)
+
+        session = self.near_cache.get(key)
+        if session is not TokenNearCache.MISSING:
+            return session
+
+        generation = self.near_cache.generation
+        session = await client.hgetall(key)
+        # Прочитанное с реплики может отставать от инвалидаций, поэтому не кешируется
+        if replica_client is None:
+            self.near_cache.set(key, session, generation)
+        return session
+
+    async def get_token_digest(
             self,
             subject: int | str,
             token_type: str,
             client_fingerprint: str,
-    ) -> str | None:
-        """Получить токен из Redis"""
-        key = self._get_token_key(subject, token_type, client_fingerprint)
-        return await self.redis_client.get(key)
+    ) -> bytes | None:
+        """Получить дайджест сохраненного токена"""
+        session = await self._get_session(subject, client_fingerprint)
+        return session.get(self.token_fields[token_type])
+
+    async def rotate_token_pair(
+            self,
+            subject: int | str,
+            client_fingerprint: str,
+            presented_refresh_token: str,
+            access_token: str | None,
+            refresh_token: str,
+            refresh_expire_time: int,
+    ) -> Literal["rotated", "reused", "missing"]:
+        """
+        Атомарно заменить пару токенов сессии за один запрос к Redis
+
+        Новая пара сохраняется, только если предъявленный refresh-токен
+        совпадает с сохраненным, поэтому из параллельных обновлений
+        одним и тем же токеном успешно только одно.
+
+        Returns:
+            rotated - токены заменены, reused - предъявлен refresh-токен,
+            замененный при последней ротации этой сессии, missing - сессия
+            отозвана или истекла либо токен ей не выдавался
+        """
+        key = self._get_session_key(subject, client_fingerprint)
+        result = await self._run_write_script(
+            ROTATE_SCRIPT,
+            keys=[key, self._get_sessions_key(subject)],
+            args=[
+                self.token_digest(presented_refresh_token),
+                self.token_digest(access_token) if access_token is not None else b"",
+                self.token_digest(refresh_token),
+                refresh_expire_time,
+                self._pack_fingerprint(client_fingerprint),
+                time.time(),
+                self._invalidation_channel,
+            ],
+        )
+
+        self._invalidate_local([key])
+        return {1: "rotated", 0: "reused"}.get(int(result), "missing")
 
     async def invalidate_token(
             self,
@@ -64,25 +454,69 @@ class RedisTokenManager:
             client_fingerprint: str,
     ):
         """Удалить токен из Redis"""
-        key = self._get_token_key(subject, token_type, client_fingerprint)
-        await self.redis_client.delete(key)
-    
+        key = self._get_session_key(subject, client_fingerprint)
+        await self._run_write_script(
+            INVALIDATE_TOKEN_SCRIPT,
+            keys=[key],
+            args=[self.token_fields[token_type], self._invalidation_channel],
+        )
+        self._invalidate_local([key])
+
     async def invalidate_token_pair(
             self,
             subject: int | str,
             client_fingerprint: str,
     ):
         """Удалить пару токенов из Redis"""
-        for token_type in (self.access_token_prefix, self.refresh_token_prefix):
-            await self.invalidate_token(subject, token_type, client_fingerprint)
+        key = self._get_session_key(subject, client_fingerprint)
+        await self._run_write_script(
+            INVALIDATE_SESSION_SCRIPT,
+            keys=[key, self._get_sessions_key(subject)],
+            args=[self._pack_fingerprint(client_fingerprint), self._invalidation_channel],
+        )
+        self._invalidate_local([key])
 
     async def invalidate_all_user_tokens(
             self,
             subject: int | str,
     ):
-        """Удалить все токены для пользователя на всех устройствах"""
-        for k in await self._get_user_tokens(subject):
-            await self.redis_client.delete(k)
+        """Удалить все токены для пользователя на всех устройствах за один запрос к Redis"""
+        if self.cluster_mode:
+            await self._invalidate_all_user_tokens_cluster(subject)
+            return
+
+        keys = await self._run_write_script(
+            INVALIDATE_ALL_SCRIPT,
+            keys=[self._get_sessions_key(subject)],
+            args=[self._get_session_prefix(subject), self._invalidation_channel],
+        )
+        self._invalidate_local(keys)
+
+    async def _invalidate_all_user_tokens_cluster(
+            self,
+            subject: int | str,
+    ):
+        """
+        Удалить все токены пользователя в Redis Cluster
+
+        Скрипт может обращаться только к переданным ему ключам, поэтому ключи
+        сессий сначала читаются из индекса, а затем удаляются одной транзакцией
+        (все они находятся в слоте пользователя). В Redis Cluster чтение с реплик
+        не используется, поэтому подтверждение репликами не ожидается.
+        """
+        sessions_key = self._get_sessions_key(subject)
+        prefix = self._get_session_prefix(subject)
+        keys = [prefix + fingerprint for fingerprint in await self.redis_client.zrange(sessions_key, 0, -1)]
+
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.unlink(*keys, sessions_key)
+            await pipe.execute()
+
+        # PUBLISH не имеет ключа и не может входить в транзакцию Redis Cluster
+        if self.near_cache is not None:
+            for key in keys:
+                await self.redis_client.publish(self.invalidation_channel, key)
+        self._invalidate_local(keys)
 
     async def is_token_verified(
             self,
@@ -91,8 +525,157 @@ class RedisTokenManager:
             token: str,
             client_fingerprint: str,
     ) -> bool:
-        """Проверить, является ли токен черным списком"""
-        stored_token = await self.get_token(subject, token_type, client_fingerprint)
-        
-        return stored_token == token
- 
\ No newline at end of file
+        """
+        Проверить, является ли токен черным списком
+
+        Если настроены реплики, запись сессии читается с реплики. Изменения
+        сессий завершаются после подтверждения репликами (см. _run_write_script),
+        поэтому отозванный токен на реплике уже не найдется. Токен, не найденный
+        на реплике (например, только что выпущенный), перепроверяется на основном узле.
+        """
+        field = self.token_fields[token_type]
+        digest = self.token_digest(token)
+        replica_client = self.replica_client
+
+        session = await self._get_session(subject, client_fingerprint, replica_client)
+        if field in session and hmac.compare_digest(session[field], digest):
+            return True
+        if replica_client is None:
+            return False
+
+        session = await self._get_session(subject, client_fingerprint)
+        return field in session and hmac.compare_digest(session[field], digest)
+
+    async def are_tokens_verified(
+            self,
+            tokens: list[tuple[int | str, str, str, str]],
+    ) -> list[bool]:
+        """
+        Проверить несколько токенов за один запрос к Redis
+
+        Записи сессий, которых нет в локальном кеше, читаются одним конвейером
+        с основного узла (токены пакета могли быть выпущены только что).
+
+        Args:
+            tokens: Пользователь, тип токена, токен и отпечаток клиента для каждого токена
+
+        Returns:
+            Результаты проверки в порядке токенов
+        """
+        keys = [self._get_session_key(subject, client_fingerprint) for subject, _, _, client_fingerprint in tokens]
+        sessions = [
+            self.near_cache.get(key) if self.near_cache is not None else TokenNearCache.MISSING
+            for key in keys
+        ]
+        missing = [i for i, session in enumerate(sessions) if session is TokenNearCache.MISSING]
+
+        if missing:
+            generation = self.near_cache.generation if self.near_cache is not None else 0
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for i in missing:
+                    pipe.hgetall(keys[i])
+                for i, session in zip(missing, await pipe.execute()):
+                    sessions[i] = session
+                    if self.near_cache is not None:
+                        self.near_cache.set(keys[i], session, generation)
+
+        results = []
+        for (_, token_type, token, _), session in zip(tokens, sessions):
+            stored_digest = session.get(self.token_fields[token_type])
+            results.append(
+                stored_digest is not None and hmac.compare_digest(stored_digest, self.token_digest(token))
+            )
+        return results
+
+    def _get_epoch_keys(
+            self,
+            subject: int | str,
+            client_fingerprint: str,
+    ) -> tuple[bytes, bytes]:
+        """Получить ключи эпох пользователя и сессии"""
+        user_epoch_key = b"%s:%s" % (self.epoch_prefix, self._get_hash_tag(subject))
+        return user_epoch_key, b"%s:%s" % (user_epoch_key, self._pack_fingerprint(client_fingerprint))
+
+    async def get_epochs(
+            self,
+            subject: int | str,
+            client_fingerprint: str,
+    ) -> tuple[int, int]:
+        """Получить текущие эпохи пользователя и сессии"""
+        user_epoch, session_epoch = await self.redis_client.mget(
+            self._get_epoch_keys(subject, client_fingerprint)
+        )
+        return int(user_epoch or 0), int(session_epoch or 0)
+
+    async def get_many_epochs(
+            self,
+            sessions: list[tuple[int | str, str]],
+    ) -> list[tuple[int, int]]:
+        """
+        Получить эпохи нескольких сессий за один запрос к Redis
+
+        Args:
+            sessions: Пользователь и отпечаток клиента для каждой сессии
+
+        Returns:
+            Эпохи пользователя и сессии в порядке сессий
+        """
+        # Ключи разных пользователей лежат в разных слотах, поэтому MGET выполняется
+        # на пользователя, а конвейер отправляет их одним пакетом
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for subject, client_fingerprint in sessions:
+                pipe.mget(self._get_epoch_keys(subject, client_fingerprint))
+            results = await pipe.execute()
+        return [(int(user_epoch or 0), int(session_epoch or 0)) for user_epoch, session_epoch in results]
+
+    async def bump_session_epoch(
+            self,
+            subject: int | str,
+            client_fingerprint: str,
+            expire_time: int,
+    ) -> int:
+        """
+        Увеличить эпоху сессии, сделав недействительными ее токены доступа
+
+        Ключ эпохи живет не меньше срока действия токенов сессии,
+        поэтому после его истечения токенов со старыми эпохами уже нет.
+        """
+        _, session_epoch_key = self._get_epoch_keys(subject, client_fingerprint)
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.incr(session_epoch_key)
+            pipe.expire(session_epoch_key, expire_time)
+            session_epoch, _ = await pipe.execute()
+        return int(session_epoch)
+
+    async def bump_user_epoch(
+            self,
+            subject: int | str,
+    ) -> int:
+        """Увеличить эпоху пользователя, сделав недействительными токены доступа на всех устройствах"""
+        user_epoch_key, _ = self._get_epoch_keys(subject, "")
+        return int(await self.redis_client.incr(user_epoch_key))
+
+    async def run_invalidation_listener(self, reconnect_delay: float = 1):
+        """
+        Слушать канал инвалидации и удалять измененные ключи из локального кеша
+
+        Пока подписка не активна (до подключения и после разрыва соединения),
+        локальный кеш очищен и не используется, поэтому пропущенные сообщения
+        не приводят к использованию отозванных токенов.
+        """
+        while True:
+            pubsub = self.redis_client.pubsub()
+            try:
+                await pubsub.subscribe(self.invalidation_channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "subscribe":
+                        self.near_cache.enable()
+                        logger.info("Локальный кеш токенов подписан на канал инвалидации")
+                    elif message["type"] == "message":
+                        self.near_cache.invalidate(message["data"])
+            except RedisError as e:
+                logger.warning(f"Потеряна подписка на канал инвалидации токенов: {e}")
+            finally:
+                self.near_cache.disable()
+                await pubsub.aclose()
+            await asyncio.sleep(reconnect_delay)
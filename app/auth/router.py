@@ -1,31 +1,49 @@
+import time
 from typing import List, Annotated
-from fastapi import APIRouter, Response, Depends, Request
+from fastapi import APIRouter, HTTPException, Response, Depends, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from loguru import logger
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.models import User
+from app.config import settings
 from app.auth.dao import UsersDAO
 from app.auth.utils import (
     password_service, 
+    registration_guard,
     token_service,
 )
 from app.exceptions import (
     UserAlreadyExistsException, 
     IncorrectEmailOrPasswordException,
+    NoJwtException,
+    NoSessionJwtException,
+    TokenStoreUnavailableException,
+    UserNotFoundException,
 )
 from app.auth.schemas import (
     SUserRegister, 
     UsernameModel, 
     SUserAddDB, 
     SUserInfo, 
+    SUserPrincipal,
     STokens, 
     SRefreshToken,
+    SIntrospectionRequest,
+    SIntrospectionResponse,
+    SIntrospectionResult,
 )
 from app.auth.dependencies import (
+    build_client_fingerprint,
+    check_introspection_secret,
+    check_login_rate_limit,
     get_current_user, 
     get_current_admin_user, 
     get_client_fingerprint,
+    get_principal_from_payload,
+    get_token_payload,
+    oauth2_scheme,
 )
 from app.dao.dependencies import (
     get_session_with_commit, 
@@ -33,6 +51,7 @@ from app.dao.dependencies import (
 )
 
 router = APIRouter()
+well_known_router = APIRouter()
 
 
 @router.post("/register")
@@ -47,27 +66,35 @@ async def register_user(
         user_data: Данные для регистрации
         db_session: Сессия базы данных
     """
-    # Проверка существования пользователя
     user_dao = UsersDAO(db_session)
 
-    existing_user = await user_dao.find_one_or_none(
-        filters=UsernameModel(username=user_data.username)
-    )
+    # Не допускаем параллельную регистрацию одного и того же логина
+    async with registration_guard.reserve(user_data.username):
+        # Проверка существования пользователя до хеширования пароля
+        existing_user = await user_dao.find_one_or_none(
+            filters=UsernameModel(username=user_data.username)
+        )
 
-    if existing_user:
-        raise UserAlreadyExistsException()
+        if existing_user:
+            raise UserAlreadyExistsException()
 
-    # Подготовка данных для добавления
-    user_data_dict = user_data.model_dump()
-    user_data_dict.pop('confirm_password', None)
+        # Хешируем пароль вне event loop только для регистраций, которые могут пройти
+        user_data_dict = user_data.model_dump(exclude={'confirm_password'})
+        user_data_dict['password'] = await password_service.get_password_hash_async(user_data.password)
 
-    # Добавление пользователя
-    await user_dao.add(values=SUserAddDB(**user_data_dict))
+        # Добавление пользователя
+        try:
+            await user_dao.add(values=SUserAddDB(**user_data_dict))
+        except IntegrityError:
+            raise UserAlreadyExistsException()
 
     return {'message': 'Вы успешно зарегистрированы!'}
 
 
-@router.post("/token")
+@router.post(
+    "/token",
+    dependencies=[Depends(check_login_rate_limit)],
+)
 async def get_tokens(
         form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
         db_session: AsyncSession = Depends(get_session_without_commit),
@@ -86,7 +113,7 @@ async def get_tokens(
         filters=UsernameModel(username=form_data.username)
     )
 
-    if not (user and password_service.authenticate_user(user=user, password=form_data.password)):
+    if not (user and await password_service.authenticate_user_async(user=user, password=form_data.password)):
         raise IncorrectEmailOrPasswordException(
             headers={'WWW-Authenticate': 'Bearer'},
         )
@@ -94,6 +121,7 @@ async def get_tokens(
     tokens = await token_service.create_tokens(
             data={"sub": str(user.id)},
             client_fingerprint=client_fingerprint,
+            claims=token_service.get_user_claims(user),
         )
 
     return STokens(
@@ -104,7 +132,7 @@ async def get_tokens(
 @router.post("/logout")
 async def logout(
         request: Request,
-        user: User = Depends(get_current_user),
+        user: User | SUserPrincipal = Depends(get_current_user),
 ):
     """
     Выход из системы
@@ -122,7 +150,7 @@ async def logout(
 
 
 @router.get("/me")
-async def get_me(user: User = Depends(get_current_user)) -> SUserInfo:
+async def get_me(user: User | SUserPrincipal = Depends(get_current_user)) -> SUserInfo:
     """
     Получаем информацию о текущем пользователе
 
@@ -132,6 +160,62 @@ async def get_me(user: User = Depends(get_current_user)) -> SUserInfo:
     return user
 
 
+@router.get(
+    "/verify",
+    status_code=status.HTTP_204_NO_CONTENT,
+    response_class=Response,
+)
+async def verify_for_proxy(
+        request: Request,
+        token: Annotated[str, Depends(oauth2_scheme)],
+) -> Response:
+    """
+    Проверяем токен доступа для nginx auth_request
+
+    Отвечает 204 без тела с идентификатором пользователя в заголовках или 401.
+    При недоступном хранилище сессий, если политика REDIS_BREAKER_POLICY не
+    позволяет принять токен, доступ запрещается (401): ответ 503 nginx
+    превратил бы в 500. Пользователь из БД не загружается. Решение можно кешировать на прокси
+    (X-Accel-Expires) не дольше VERIFY_CACHE_SECONDS и срока действия токена.
+
+    Args:
+        request: Запрос
+        token: Токен доступа из заголовка Authorization
+    """
+    try:
+        payload = get_token_payload(token)
+    except HTTPException as e:
+        # auth_request понимает только 2xx, 401 и 403
+        if e.status_code == status.HTTP_401_UNAUTHORIZED:
+            raise
+        raise NoJwtException()
+
+    user_id = payload['sub']
+    if payload.get('type') != 'access':
+        raise NoJwtException()
+    try:
+        verified = await token_service.verify_token(
+            token, user_id, "access", get_client_fingerprint(request), payload,
+        )
+    except TokenStoreUnavailableException:
+        logger.warning("Хранилище сессий недоступно, проверка токена для прокси отклонена")
+        raise NoJwtException()
+    if not verified:
+        raise NoJwtException()
+
+    cache_seconds = max(0, min(settings.VERIFY_CACHE_SECONDS, int(payload['exp'] - time.time())))
+    headers = {
+        'X-User-Id': str(user_id),
+        'X-Token-Expires': str(payload['exp']),
+        'X-Accel-Expires': str(cache_seconds),
+        'Cache-Control': 'private, no-store',
+        'Vary': 'Authorization, User-Agent',
+    }
+    if 'role_id' in payload:
+        headers['X-User-Role-Id'] = str(payload['role_id'])
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=headers)
+
+
 @router.get(
     "/all_users",
     dependencies=[Depends(get_current_admin_user)],
@@ -163,18 +247,96 @@ async def process_refresh_token(
         request: Запрос
     """
     client_fingerprint = get_client_fingerprint(request)
-    user = await get_current_user(
-        token=refresh_token.refresh_token,
-        db_session=db_session,
-        token_type="refresh",
-        client_fingerprint=client_fingerprint
-    )
-    
-    tokens = await token_service.create_tokens(
+    payload = get_token_payload(refresh_token.refresh_token)
+    # Токен другого типа не участвует в ротации и не должен отзывать сессию
+    if payload.get('type') != 'refresh':
+        raise NoJwtException()
+
+    user = await UsersDAO(db_session).find_one_or_none_by_id(data_id=int(payload['sub']))
+    if not user:
+        raise UserNotFoundException()
+
+    # Проверка refresh-токена и замена пары выполняются в Redis атомарно
+    tokens = await token_service.rotate_tokens(
+        refresh_token=refresh_token.refresh_token,
         data={"sub": str(user.id)},
         client_fingerprint=client_fingerprint,
+        claims=token_service.get_user_claims(user),
     )
+    if tokens is None:
+        raise NoSessionJwtException()
 
     return STokens(
         **tokens
     )
+
+
+@router.post(
+    "/introspect/batch",
+    dependencies=[Depends(check_introspection_secret)],
+)
+async def introspect_tokens(
+        request_data: SIntrospectionRequest,
+        db_session: AsyncSession = Depends(get_session_without_commit),
+) -> SIntrospectionResponse:
+    """
+    Проверяем пакет токенов доступа для API-шлюза
+
+    Токены проверяются в хранилище сессий одним запросом, а пользователи
+    загружаются одним запросом к БД (или восстанавливаются из утверждений токена).
+
+    Args:
+        request_data: Токены с IP-адресом и User-Agent клиентов
+        db_session: Сессия базы данных
+    """
+    payloads = []
+    for item in request_data.tokens:
+        try:
+            payload = get_token_payload(item.token)
+        except HTTPException:
+            payload = None
+        payloads.append(payload if payload and payload.get('type') == 'access' else None)
+
+    checked = [(item, payload) for item, payload in zip(request_data.tokens, payloads) if payload is not None]
+    verified = await token_service.verify_tokens([
+        (item.token, payload['sub'], 'access', build_client_fingerprint(item.user_agent, item.client_ip), payload)
+        for item, payload in checked
+    ])
+    active = {id(item): payload for (item, payload), is_verified in zip(checked, verified) if is_verified}
+
+    users = {}
+    user_ids = []
+    for payload in active.values():
+        if settings.TOKEN_EMBED_CLAIMS and "role_id" in payload:
+            users[payload['sub']] = get_principal_from_payload(payload)
+        else:
+            user_ids.append(int(payload['sub']))
+    for user in await UsersDAO(db_session).find_all_by_ids(user_ids):
+        users[str(user.id)] = user
+
+    results = []
+    for item in request_data.tokens:
+        payload = active.get(id(item))
+        user = users.get(payload['sub']) if payload else None
+        if user is None:
+            results.append(SIntrospectionResult(active=False))
+            continue
+        results.append(SIntrospectionResult(
+            active=True,
+            sub=payload['sub'],
+            exp=payload['exp'],
+            user=SUserInfo.model_validate(user, from_attributes=True),
+        ))
+    return SIntrospectionResponse(results=results)
+
+
+@well_known_router.get("/.well-known/jwks.json")
+async def get_jwks(response: Response) -> dict:
+    """
+    Публичные ключи для локальной проверки токенов сервисами-потребителями
+
+    Args:
+        response: Ответ
+    """
+    response.headers['Cache-Control'] = f'public, max-age={settings.JWT_JWKS_MAX_AGE_SECONDS}'
+    return token_service.jwks()
@@ -1,5 +1,10 @@
 from pydantic import BaseModel, ConfigDict, Field, model_validator, computed_field
-from app.auth.utils import password_service
+
+from app.config import settings
+
+
+class UserIdModel(BaseModel):
+    id: int = Field(description="Идентификатор пользователя")
 
 
 class UsernameModel(BaseModel):
@@ -20,7 +25,6 @@ class SUserRegister(UserBase):
     def check_password(self):
         if self.password != self.confirm_password:
             raise ValueError("Пароли не совпадают")
-        self.password = password_service.get_password_hash(self.password) # хешируем пароль до сохранения в базе данных
         return self
 
 
@@ -28,6 +32,10 @@ class SUserAddDB(UserBase):
     password: str = Field(min_length=5, description="Пароль в формате HASH-строки")
 
 
+class SUserPasswordUpdate(BaseModel):
+    password: str = Field(min_length=5, description="Пароль в формате HASH-строки")
+
+
 class SUserAuth(UsernameModel):
     password: str = Field(min_length=5, max_length=50, description="Пароль, от 5 до 50 знаков")
 
@@ -38,6 +46,18 @@ class RoleModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class SUserPrincipal(UsernameModel):
+    """Пользователь, восстановленный из утверждений токена доступа без обращения к БД"""
+    id: int = Field(description="Идентификатор пользователя")
+    first_name: str = Field(description="Имя")
+    last_name: str = Field(description="Фамилия")
+    role: RoleModel = Field(description="Роль пользователя")
+
+    @property
+    def role_id(self) -> int:
+        return self.role.id
+
+
 class SUserInfo(UserBase):
     id: int = Field(description="Идентификатор пользователя")
     role: RoleModel = Field(exclude=True)
@@ -59,3 +79,28 @@ class SRefreshToken(BaseModel):
 
 class STokens(SAccessToken, SRefreshToken):
     token_type: str = "Bearer"
+
+
+class SIntrospectionItem(BaseModel):
+    token: str = Field(description="Токен доступа")
+    client_ip: str = Field(description="IP-адрес клиента, предъявившего токен")
+    user_agent: str | None = Field(default=None, description="User-Agent клиента")
+
+
+class SIntrospectionRequest(BaseModel):
+    tokens: list[SIntrospectionItem] = Field(
+        min_length=1,
+        max_length=settings.INTROSPECTION_BATCH_MAX_SIZE,
+        description="Токены для проверки",
+    )
+
+
+class SIntrospectionResult(BaseModel):
+    active: bool = Field(description="Токен действителен")
+    sub: str | None = Field(default=None, description="Идентификатор пользователя")
+    exp: int | None = Field(default=None, description="Время истечения токена (unix time)")
+    user: SUserInfo | None = Field(default=None, description="Пользователь")
+
+
+class SIntrospectionResponse(BaseModel):
+    results: list[SIntrospectionResult]
@@ -0,0 +1,182 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+from app.metrics import metrics
+
+
+class TokenPayloadCache:
+    """
+    LRU-кеш проверенных полезных нагрузок JWT
+
+    Ключ - SHA-256 от токена, запись живет до момента истечения токена (exp).
+    Позволяет не разбирать и не проверять подпись одного и того же токена повторно.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+
+        metrics.describe("token_cache_hits_total", "Число попаданий в кеш проверенных токенов")
+        metrics.describe("token_cache_misses_total", "Число промахов кеша проверенных токенов")
+        metrics.register_gauge("token_cache_size", lambda: len(self._entries))
+
+    @staticmethod
+    def _get_key(token: str) -> bytes:
+        """Получить ключ кеша для токена"""
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> dict | None:
+        """Получить полезную нагрузку токена из кеша"""
+        key = self._get_key(token)
+        entry = self._entries.get(key)
+
+        if entry is not None and entry[1] <= time.time():
+            del self._entries[key]
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            metrics.inc("token_cache_misses_total")
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        metrics.inc("token_cache_hits_total")
+        return dict(entry[0])
+
+    def set(self, token: str, payload: dict) -> None:
+        """Сохранить проверенную полезную нагрузку токена"""
+        expire = payload.get('exp')
+        if not expire:
+            return
+
+        key = self._get_key(token)
+        self._entries[key] = (dict(payload), float(expire))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Очистить кеш"""
+        self._entries.clear()
+
+
+class EpochCache:
+    """
+    Локальный кеш эпох отзыва токенов
+
+    Хранит эпохи пользователя и сессии не дольше ttl секунд, поэтому отзыв,
+    выполненный другим воркером, начинает действовать не позже чем через ttl.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple[str, str], tuple[int, int, float]] = OrderedDict()
+
+        metrics.describe("token_epoch_cache_hits_total", "Число попаданий в кеш эпох")
+        metrics.describe("token_epoch_cache_misses_total", "Число промахов кеша эпох")
+
+    def get(self, subject: int | str, client_fingerprint: str) -> tuple[int, int] | None:
+        """Получить эпохи пользователя и сессии"""
+        key = (str(subject), client_fingerprint)
+        entry = self._entries.get(key)
+
+        if entry is None or entry[2] <= time.monotonic():
+            self._entries.pop(key, None)
+            metrics.inc("token_epoch_cache_misses_total")
+            return None
+
+        metrics.inc("token_epoch_cache_hits_total")
+        return entry[0], entry[1]
+
+    def set(self, subject: int | str, client_fingerprint: str, epochs: tuple[int, int]) -> None:
+        """Сохранить эпохи пользователя и сессии"""
+        key = (str(subject), client_fingerprint)
+        self._entries[key] = (epochs[0], epochs[1], time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, subject: int | str, client_fingerprint: str | None = None) -> None:
+        """Удалить эпохи сессии или, если сессия не указана, всех сессий пользователя"""
+        if client_fingerprint is not None:
+            self._entries.pop((str(subject), client_fingerprint), None)
+            return
+
+        for key in [key for key in self._entries if key[0] == str(subject)]:
+            del self._entries[key]
+
+
+class TokenNearCache:
+    """
+    Локальная копия записей сессий из Redis
+
+    Запись удаляется по сообщению об изменении ключа из канала инвалидации,
+    а также не живет дольше ttl секунд на случай потери сообщений.
+    Пока подписка на канал не активна, кеш не используется.
+    """
+
+    MISSING = object()
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.active = False
+        self.generation = 0
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+
+        metrics.describe("token_near_cache_hits_total", "Число попаданий в локальный кеш токенов")
+        metrics.describe("token_near_cache_misses_total", "Число промахов локального кеша токенов")
+        metrics.register_gauge("token_near_cache_size", lambda: len(self._entries))
+
+    def get(self, key: bytes) -> dict | object:
+        """Получить значение ключа или MISSING, если его нет в кеше"""
+        entry = self._entries.get(key) if self.active else None
+
+        if entry is None or entry[1] <= time.monotonic():
+            self._entries.pop(key, None)
+            metrics.inc("token_near_cache_misses_total")
+            return self.MISSING
+
+        self._entries.move_to_end(key)
+        metrics.inc("token_near_cache_hits_total")
+        return entry[0]
+
+    def set(self, key: bytes, value: dict, generation: int) -> None:
+        """
+        Сохранить значение ключа, прочитанное из Redis
+
+        Значение не сохраняется, если с начала чтения (generation) пришла
+        какая-либо инвалидация - иначе в кеш может попасть устаревшее значение.
+        """
+        if not self.active or generation != self.generation:
+            return
+
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: bytes) -> None:
+        """Удалить значение ключа"""
+        self.generation += 1
+        self._entries.pop(key, None)
+
+    def enable(self) -> None:
+        """Начать использовать кеш после подписки на канал инвалидации"""
+        self.clear()
+        self.active = True
+
+    def disable(self) -> None:
+        """Перестать использовать кеш при потере подписки на канал инвалидации"""
+        self.active = False
+        self.clear()
+
+    def clear(self) -> None:
+        """Очистить кеш"""
+        self.generation += 1
+        self._entries.clear()
@@ -0,0 +1,434 @@
+import hmac
+import heapq
+import time
+from typing import Literal, Protocol
+
+from loguru import logger
+
+from app.auth.redis_manager import RedisTokenManager
+from app.auth.token_cache import TokenNearCache
+from app.metrics import metrics
+
+
+class TokenStore(Protocol):
+    """Хранилище дайджестов токенов сессий, используемое TokenService"""
+
+    near_cache: TokenNearCache | None
+
+    async def store_token(
+            self,
+            subject: int | str,
+            token: str,
+            token_type: str,
+            expire_time: int,
+            client_fingerprint: str,
+    ): ...
+
+    async def store_token_pair(
+            self,
+            subject: int | str,
+            access_token: str | None,
+            refresh_token: str,
+            refresh_expire_time: int,
+            client_fingerprint: str,
+    ): ...
+
+    async def rotate_token_pair(
+            self,
+            subject: int | str,
+            client_fingerprint: str,
+            presented_refresh_token: str,
+            access_token: str | None,
+            refresh_token: str,
+            refresh_expire_time: int,
+    ) -> Literal["rotated", "reused", "missing"]: ...
+
+    async def get_token_digest(
+            self,
+            subject: int | str,
+            token_type: str,
+            client_fingerprint: str,
+    ) -> bytes | None: ...
+
+    async def is_token_verified(
+            self,
+            subject: int | str,
+            token_type: str,
+            token: str,
+            client_fingerprint: str,
+    ) -> bool: ...
+
+    async def are_tokens_verified(
+            self,
+            tokens: list[tuple[int | str, str, str, str]],
+    ) -> list[bool]: ...
+
+    async def list_user_sessions(
+            self,
+            subject: int | str,
+    ) -> dict[str, float]: ...
+
+    async def invalidate_token(
+            self,
+            subject: int | str,
+            token_type: str,
+            client_fingerprint: str,
+    ): ...
+
+    async def invalidate_token_pair(
+            self,
+            subject: int | str,
+            client_fingerprint: str,
+    ): ...
+
+    async def invalidate_all_user_tokens(
+            self,
+            subject: int | str,
+    ): ...
+
+    async def get_epochs(
+            self,
+            subject: int | str,
+            client_fingerprint: str,
+    ) -> tuple[int, int]: ...
+
+    async def get_many_epochs(
+            self,
+            sessions: list[tuple[int | str, str]],
+    ) -> list[tuple[int, int]]: ...
+
+    async def bump_session_epoch(
+            self,
+            subject: int | str,
+            client_fingerprint: str,
+            expire_time: int,
+    ) -> int: ...
+
+    async def bump_user_epoch(
+            self,
+            subject: int | str,
+    ) -> int: ...
+
+
+class _MemorySession:
+    """Запись сессии в памяти процесса"""
+
+    __slots__ = ('digests', 'previous_refresh_digest', 'expires_at', 'generation')
+
+    def __init__(self, generation: int):
+        self.digests: dict[str, bytes] = {}
+        self.previous_refresh_digest: bytes | None = None
+        self.expires_at = 0.0
+        self.generation = generation
+
+
+class InMemoryTokenStore:
+    """
+    Хранилище дайджестов токенов в памяти процесса
+
+    Подходит для развертывания в одном процессе и для нагрузочных стендов:
+    токены проверяются без сетевых запросов. Воркеры не видят сессии друг
+    друга, поэтому при нескольких воркерах нужно хранилище Redis.
+
+    Истекшие сессии удаляются по куче времен истечения при записи. Все сессии
+    пользователя отзываются за O(1): увеличивается поколение пользователя,
+    и записи прежних поколений считаются отсутствующими.
+    """
+
+    near_cache = None
+
+    def __init__(self):
+        self._sessions: dict[tuple[str, str], _MemorySession] = {}
+        self._user_sessions: dict[str, set[str]] = {}
+        self._user_generations: dict[str, int] = {}
+        self._expiry_heap: list[tuple[float, str, str]] = []
+        self._user_epochs: dict[str, int] = {}
+        self._session_epochs: dict[tuple[str, str], tuple[int, float]] = {}
+
+        metrics.register_gauge("token_store_memory_sessions", lambda: len(self._sessions))
+
+    def _remove_session(self, subject: str, client_fingerprint: str) -> None:
+        """Удалить запись сессии и ее отпечаток из индекса пользователя"""
+        self._sessions.pop((subject, client_fingerprint), None)
+        fingerprints = self._user_sessions.get(subject)
+        if fingerprints is not None:
+            fingerprints.discard(client_fingerprint)
+            if not fingerprints:
+                del self._user_sessions[subject]
+
+    def _get_live_session(self, subject: str, client_fingerprint: str) -> _MemorySession | None:
+        """Получить запись сессии, если она не истекла и не отозвана"""
+        session = self._sessions.get((subject, client_fingerprint))
+        if session is None:
+            return None
+        if session.expires_at <= time.monotonic() or session.generation != self._user_generations.get(subject, 0):
+            self._remove_session(subject, client_fingerprint)
+            return None
+        return session
+
+    def _purge_expired(self) -> None:
+        """Удалить истекшие сессии по куче времен истечения"""
+        now = time.monotonic()
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, subject, client_fingerprint = heapq.heappop(self._expiry_heap)
+            session = self._sessions.get((subject, client_fingerprint))
+            # Продленная сессия имеет в куче более позднюю запись
+            if session is not None and session.expires_at <= now:
+                self._remove_session(subject, client_fingerprint)
+
+        # Каждое продление добавляет запись в кучу: устаревшие записи периодически отбрасываются
+        if len(self._expiry_heap) > 2 * len(self._sessions) + 1024:
+            self._expiry_heap = [
+                (session.expires_at, subject, client_fingerprint)
+                for (subject, client_fingerprint), session in self._sessions.items()
+            ]
+            heapq.heapify(self._expiry_heap)
+            self._session_epochs = {
+                key: value for key, value in self._session_epochs.items() if value[1] > now
+            }
+
+    def _store_tokens(
+            self,
+            subject: int | str,
+            client_fingerprint: str,
+            tokens: dict[str, str | None],
+            expire_time: int,
+    ) -> None:
+        """
+        Сохранить дайджесты токенов сессии
+
+        Args:
+            subject: Пользователь
+            client_fingerprint: Отпечаток клиента
+            tokens: Токены по типам, None - удалить токен этого типа
+            expire_time: Время жизни самого долгоживущего токена (секунды)
+        """
+        self._purge_expired()
+        subject = str(subject)
+        session = self._get_live_session(subject, client_fingerprint)
+        if session is None:
+            session = _MemorySession(self._user_generations.get(subject, 0))
+            self._sessions[(subject, client_fingerprint)] = session
+            self._user_sessions.setdefault(subject, set()).add(client_fingerprint)
+
+        for token_type, token in tokens.items():
+            if token is None:
+                session.digests.pop(token_type, None)
+            else:
+                session.digests[token_type] = RedisTokenManager.token_digest(token)
+        # Новый refresh-токен начинает новую цепочку ротаций
+        if tokens.get(RedisTokenManager.refresh_token_prefix) is not None:
+            session.previous_refresh_digest = None
+
+        expires_at = time.monotonic() + expire_time
+        if expires_at > session.expires_at:
+            session.expires_at = expires_at
+            heapq.heappush(self._expiry_heap, (expires_at, subject, client_fingerprint))
+
+    async def store_token(
+            self,
+            subject: int | str,
+            token: str,
+            token_type: str,
+            expire_time: int,
+            client_fingerprint: str,
+    ):
+        """Сохранить токен с истечением времени"""
+        self._store_tokens(subject, client_fingerprint, {token_type: token}, expire_time)
+
+    async def store_token_pair(
+            self,
+            subject: int | str,
+            access_token: str | None,
+            refresh_token: str,
+            refresh_expire_time: int,
+            client_fingerprint: str,
+    ):
+        """
+        Сохранить пару токенов
+
+        Если access_token не указан, сохраняется только refresh-токен.
+        """
+        self._store_tokens(
+            subject,
+            client_fingerprint,
+            {
+                RedisTokenManager.access_token_prefix: access_token,
+                RedisTokenManager.refresh_token_prefix: refresh_token,
+            },
+            refresh_expire_time,
+        )
+
+    async def rotate_token_pair(
+            self,
+            subject: int | str,
+            client_fingerprint: str,
+            presented_refresh_token: str,
+            access_token: str | None,
+            refresh_token: str,
+            refresh_expire_time: int,
+    ) -> Literal["rotated", "reused", "missing"]:
+        """
+        Заменить пару токенов сессии, если предъявлен текущий refresh-токен
+
+        Между проверкой и записью нет точек переключения event loop,
+        поэтому из параллельных обновлений одним токеном успешно только одно.
+        """
+        session = self._get_live_session(str(subject), client_fingerprint)
+        stored_digest = session.digests.get(RedisTokenManager.refresh_token_prefix) if session else None
+        if stored_digest is None:
+            return "missing"
+        presented_digest = RedisTokenManager.token_digest(presented_refresh_token)
+        if not hmac.compare_digest(stored_digest, presented_digest):
+            previous_digest = session.previous_refresh_digest
+            if previous_digest is not None and hmac.compare_digest(previous_digest, presented_digest):
+                return "reused"
+            return "missing"
+
+        self._store_tokens(
+            subject,
+            client_fingerprint,
+            {
+                RedisTokenManager.access_token_prefix: access_token,
+                RedisTokenManager.refresh_token_prefix: refresh_token,
+            },
+            refresh_expire_time,
+        )
+        session.previous_refresh_digest = stored_digest
+        return "rotated"
+
+    async def get_token_digest(
+            self,
+            subject: int | str,
+            token_type: str,
+            client_fingerprint: str,
+    ) -> bytes | None:
+        """Получить дайджест сохраненного токена"""
+        session = self._get_live_session(str(subject), client_fingerprint)
+        return session.digests.get(token_type) if session else None
+
+    async def is_token_verified(
+            self,
+            subject: int | str,
+            token_type: str,
+            token: str,
+            client_fingerprint: str,
+    ) -> bool:
+        """Проверить, что токен совпадает с сохраненным для сессии"""
+        digest = await self.get_token_digest(subject, token_type, client_fingerprint)
+        return digest is not None and hmac.compare_digest(digest, RedisTokenManager.token_digest(token))
+
+    async def are_tokens_verified(
+            self,
+            tokens: list[tuple[int | str, str, str, str]],
+    ) -> list[bool]:
+        """Проверить несколько токенов (пользователь, тип, токен, отпечаток клиента)"""
+        return [
+            await self.is_token_verified(subject, token_type, token, client_fingerprint)
+            for subject, token_type, token, client_fingerprint in tokens
+        ]
+
+    async def list_user_sessions(
+            self,
+            subject: int | str,
+    ) -> dict[str, float]:
+        """
+        Получить активные сессии пользователя
+
+        Returns:
+            Идентификаторы сессий (см. RedisTokenManager.session_id) и время их истечения (unix time)
+        """
+        subject = str(subject)
+        offset = time.time() - time.monotonic()
+        sessions = {}
+        for client_fingerprint in list(self._user_sessions.get(subject, ())):
+            session = self._get_live_session(subject, client_fingerprint)
+            if session is not None:
+                sessions[RedisTokenManager.session_id(client_fingerprint)] = session.expires_at + offset
+        return sessions
+
+    async def invalidate_token(
+            self,
+            subject: int | str,
+            token_type: str,
+            client_fingerprint: str,
+    ):
+        """Удалить токен"""
+        session = self._get_live_session(str(subject), client_fingerprint)
+        if session is not None:
+            session.digests.pop(token_type, None)
+
+    async def invalidate_token_pair(
+            self,
+            subject: int | str,
+            client_fingerprint: str,
+    ):
+        """Удалить пару токенов"""
+        self._remove_session(str(subject), client_fingerprint)
+
+    async def invalidate_all_user_tokens(
+            self,
+            subject: int | str,
+    ):
+        """
+        Удалить все токены пользователя на всех устройствах
+
+        Записи сессий остаются в памяти до истечения или следующего обращения,
+        но уже не проходят проверку поколения.
+        """
+        subject = str(subject)
+        self._user_generations[subject] = self._user_generations.get(subject, 0) + 1
+        self._user_sessions.pop(subject, None)
+
+    async def get_epochs(
+            self,
+            subject: int | str,
+            client_fingerprint: str,
+    ) -> tuple[int, int]:
+        """Получить текущие эпохи пользователя и сессии"""
+        subject = str(subject)
+        session_epoch, expires_at = self._session_epochs.get((subject, client_fingerprint), (0, 0.0))
+        if expires_at <= time.monotonic():
+            session_epoch = 0
+        return self._user_epochs.get(subject, 0), session_epoch
+
+    async def get_many_epochs(
+            self,
+            sessions: list[tuple[int | str, str]],
+    ) -> list[tuple[int, int]]:
+        """Получить эпохи нескольких сессий (пользователь, отпечаток клиента)"""
+        return [await self.get_epochs(subject, client_fingerprint) for subject, client_fingerprint in sessions]
+
+    async def bump_session_epoch(
+            self,
+            subject: int | str,
+            client_fingerprint: str,
+            expire_time: int,
+    ) -> int:
+        """Увеличить эпоху сессии, сделав недействительными ее токены доступа"""
+        _, session_epoch = await self.get_epochs(subject, client_fingerprint)
+        session_epoch += 1
+        self._session_epochs[(str(subject), client_fingerprint)] = (session_epoch, time.monotonic() + expire_time)
+        return session_epoch
+
+    async def bump_user_epoch(
+            self,
+            subject: int | str,
+    ) -> int:
+        """Увеличить эпоху пользователя, сделав недействительными токены доступа на всех устройствах"""
+        subject = str(subject)
+        self._user_epochs[subject] = self._user_epochs.get(subject, 0) + 1
+        return self._user_epochs[subject]
+
+
+def create_token_store(name: str) -> TokenStore:
+    """
+    Создать хранилище токенов по имени
+
+    Args:
+        name: redis - общее хранилище в Redis, memory - в памяти процесса
+    """
+    if name == 'memory':
+        logger.info("Токены хранятся в памяти процесса: сессии не разделяются между воркерами")
+        return InMemoryTokenStore()
+    return RedisTokenManager()
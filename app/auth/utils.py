@@ -1,20 +1,101 @@
-from typing import Literal
+import asyncio
+import math
+import secrets
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Literal, TypeVar
 from datetime import datetime, timedelta, timezone
 
-from passlib.context import CryptContext
-from jose import jwt
+from jose import JWTError
+from loguru import logger
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
 
 from app.config import settings
+from app.auth.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.auth.codecs import create_codec
+from app.auth.dao import UsersDAO
+from app.auth.hashing import (
+    PasswordHashExecutor,
+    build_crypt_context,
+    calibrate_rounds,
+    hash_password,
+    verify_and_update_password,
+    verify_password,
+)
+from app.auth.keys import ASYMMETRIC_ALGORITHMS, KeyRing
+from app.auth.rate_limiter import LoginRateLimiter
 from app.auth.redis_manager import RedisTokenManager
 from app.auth.models import User
+from app.auth.schemas import SUserPasswordUpdate, UserIdModel
+from app.auth.token_cache import EpochCache, TokenPayloadCache
+from app.auth.token_store import create_token_store
+from app.dao.database import async_session_maker
+from app.exceptions import TokenStoreUnavailableException, UserAlreadyExistsException
+from app.metrics import metrics
+
+
+T = TypeVar('T')
 
 
 class TokenService:
     """Сервис для работы с токенами"""
 
     def __init__(self):
-        self.redis_manager = RedisTokenManager()
+        self.token_store = create_token_store(settings.TOKEN_STORE)
+        self.store_breaker = (
+            CircuitBreaker(
+                name="token_store",
+                failure_threshold=settings.REDIS_BREAKER_FAILURE_THRESHOLD,
+                call_timeout=settings.REDIS_BREAKER_CALL_TIMEOUT,
+                slow_call_seconds=settings.REDIS_BREAKER_SLOW_CALL_SECONDS,
+                reset_seconds=settings.REDIS_BREAKER_RESET_SECONDS,
+                errors=(RedisError,),
+            )
+            if settings.REDIS_BREAKER_ENABLED and settings.TOKEN_STORE == 'redis'
+            else None
+        )
+        self.codec = create_codec(settings.JWT_CODEC, settings.ALGORITHM)
+        self.payload_cache = (
+            TokenPayloadCache(max_size=settings.TOKEN_CACHE_MAX_SIZE)
+            if settings.TOKEN_CACHE_ENABLED
+            else None
+        )
+        self.epoch_cache = (
+            EpochCache(ttl=settings.TOKEN_EPOCH_CACHE_SECONDS, max_size=settings.TOKEN_CACHE_MAX_SIZE)
+            if settings.TOKEN_EPOCH_MODE
+            else None
+        )
+        metrics.describe("token_verify_degraded_total", "Число токенов доступа, принятых без проверки в хранилище")
+        self.key_ring = (
+            KeyRing(
+                algorithm=settings.ALGORITHM,
+                keys_dir=settings.JWT_KEYS_DIR,
+                rotation_interval=timedelta(days=settings.JWT_KEY_ROTATION_DAYS),
+                retention=timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+                reload_interval=settings.JWT_KEY_RELOAD_SECONDS,
+                jwks_max_age=settings.JWT_JWKS_MAX_AGE_SECONDS,
+            )
+            if settings.ALGORITHM in ASYMMETRIC_ALGORITHMS
+            else None
+        )
     
+    async def _call_store(self, method: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """
+        Вызвать метод хранилища токенов через предохранитель
+
+        Raises:
+            TokenStoreUnavailableException: Хранилище недоступно, отвечает медленно
+                или предохранитель разомкнут
+        """
+        if self.store_breaker is None:
+            return await method(*args, **kwargs)
+        try:
+            return await self.store_breaker.call(method, *args, **kwargs)
+        except (CircuitOpenError, RedisError, TimeoutError) as e:
+            raise TokenStoreUnavailableException(
+                headers={'Retry-After': str(math.ceil(settings.REDIS_BREAKER_RESET_SECONDS))}
+            ) from e
+
     def _create_token(
             self,
             payload: dict,
@@ -24,78 +105,147 @@ class TokenService:
         """Создать токен"""
         
         payload.update({"exp": int(expire_time.timestamp()), "type": token_type})
-        return jwt.encode(
+
+        if self.key_ring is None:
+            return self.codec.encode(payload, settings.SECRET_KEY)
+
+        signing_key = self.key_ring.active
+        return self.codec.encode(
             payload,
-            settings.SECRET_KEY,
-            algorithm=settings.ALGORITHM
-        )
-    
-    async def _store_token(
-            self,
-            subject: int | str,
-            token: str,
-            token_type: Literal['access', 'refresh'],
-            expire_time: datetime,
-            client_fingerprint: str,
-    ) -> None:
-        await self.redis_manager.store_token(
-            subject=subject,
-            token=token,
-            token_type=token_type,
-            expire_time=expire_time,
-            client_fingerprint=client_fingerprint,
+            signing_key.private_key,
+            headers={"kid": signing_key.kid},
         )
     
-    async def create_tokens(
+    @staticmethod
+    def get_user_claims(user: User) -> dict | None:
+        """
+        Получить утверждения о пользователе для токена доступа
+
+        Возвращает None, если встраивание утверждений выключено.
+        """
+        if not settings.TOKEN_EMBED_CLAIMS:
+            return None
+
+        return {
+            "username": user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "role_id": user.role.id,
+            "role_name": user.role.name,
+        }
+
+    async def _build_tokens(
             self,
             data: dict,
             client_fingerprint: str,
+            claims: dict | None = None,
     ) -> dict[str, str]:
-        """
-        Создать новую пару токенов
-        
-        Args:
-            data: Данные для включения в токен
-            client_fingerprint: ID сессии
-        """
+        """Подписать новую пару токенов без сохранения в Redis"""
         # Текущее время в UTC
         now = datetime.now(timezone.utc)
 
+        access_payload = {**data, **(claims or {})}
+        if self.epoch_cache is not None:
+            # Токен доступа несет эпохи пользователя и сессии вместо хранения в Redis
+            user_epoch, session_epoch = await self._call_store(
+                self.token_store.get_epochs,
+                subject=data["sub"],
+                client_fingerprint=client_fingerprint,
+            )
+            access_payload.update({"epu": user_epoch, "eps": session_epoch})
+            self.epoch_cache.set(data["sub"], client_fingerprint, (user_epoch, session_epoch))
+
         # AccessToken 
         access_token = self._create_token(
-            payload=data.copy(),
+            payload=access_payload,
             token_type="access",
             expire_time=now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         )
         
         # RefreshToken
+        # Уникальный jti: иначе пары, выпущенные в одну секунду, совпадали бы
+        # и повторное предъявление замененного refresh-токена было бы не обнаружить
         refresh_token = self._create_token(
-            payload=data.copy(),
+            payload={**data, "jti": secrets.token_urlsafe(16)},
             token_type="refresh",
             expire_time=now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
         )
 
-        # Store tokens in Redis
-        await self._store_token(
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+        }
+
+    async def create_tokens(
+            self,
+            data: dict,
+            client_fingerprint: str,
+            claims: dict | None = None,
+    ) -> dict[str, str]:
+        """
+        Создать новую пару токенов
+        
+        Args:
+            data: Данные для включения в токен
+            client_fingerprint: ID сессии
+            claims: Дополнительные утверждения только для токена доступа
+        """
+        tokens = await self._build_tokens(data, client_fingerprint, claims)
+
+        # Store tokens in Redis (в режиме эпох токен доступа не хранится)
+        await self._call_store(
+            self.token_store.store_token_pair,
             subject=data["sub"],
-            token=access_token,
-            token_type="access",
-            expire_time=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-            client_fingerprint=client_fingerprint
+            access_token=tokens["access_token"] if self.epoch_cache is None else None,
+            refresh_token=tokens["refresh_token"],
+            refresh_expire_time=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60,
+            client_fingerprint=client_fingerprint,
         )
-        
-        await self._store_token(
+
+        return tokens
+
+    async def rotate_tokens(
+            self,
+            refresh_token: str,
+            data: dict,
+            client_fingerprint: str,
+            claims: dict | None = None,
+    ) -> dict[str, str] | None:
+        """
+        Обменять refresh-токен на новую пару токенов
+
+        Проверка предъявленного токена и замена пары выполняются атомарно.
+        Повторное предъявление уже замененного refresh-токена считается
+        признаком его утечки, и сессия отзывается целиком.
+
+        Args:
+            refresh_token: Предъявленный refresh-токен
+            data: Данные для включения в токен
+            client_fingerprint: ID сессии
+            claims: Дополнительные утверждения только для токена доступа
+
+        Returns:
+            Новая пара токенов или None, если refresh-токен недействителен
+        """
+        tokens = await self._build_tokens(data, client_fingerprint, claims)
+
+        result = await self._call_store(
+            self.token_store.rotate_token_pair,
             subject=data["sub"],
-            token=refresh_token,
-            token_type="refresh",
-            expire_time=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60,
-            client_fingerprint=client_fingerprint
+            client_fingerprint=client_fingerprint,
+            presented_refresh_token=refresh_token,
+            access_token=tokens["access_token"] if self.epoch_cache is None else None,
+            refresh_token=tokens["refresh_token"],
+            refresh_expire_time=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60,
         )
 
-        return {
-            "access_token": access_token,
-            "refresh_token": refresh_token,
-        }
+        if result == "rotated":
+            return tokens
+
+        if result == "reused":
+            logger.warning(f"Повторное использование refresh-токена пользователя {data['sub']}, сессия отозвана")
+            await self.invalidate_token_pair(user_id=data["sub"], client_fingerprint=client_fingerprint)
+        return None
 
     async def verify_token(
             self,
@@ -103,6 +253,7 @@ class TokenService:
             user_id: int,
             token_type: Literal["access", "refresh"],
             client_fingerprint: str,
+            payload: dict | None = None,
     ) -> bool:
         """
         Проверить валидность токена
@@ -112,13 +263,100 @@ class TokenService:
             user_id: ID пользователя
             token_type: Тип токена (access или refresh)
             client_fingerprint: ID сессии
+            payload: Декодированный токен, если уже известен
         """
-        return await self.redis_manager.is_token_verified(
-            subject=user_id,
-            token_type=token_type,
-            token=token,
-            client_fingerprint=client_fingerprint,
-        )
+        try:
+            if self.epoch_cache is not None and token_type == "access":
+                if payload is None:
+                    payload = self.decode_token(token)
+                token_epochs = self._get_token_epochs(payload)
+                if token_epochs is None:
+                    return False
+                epochs = await self._get_epochs(user_id, client_fingerprint, token_epochs)
+                return self._is_epoch_current(token_epochs, epochs)
+
+            return await self._call_store(
+                self.token_store.is_token_verified,
+                subject=user_id,
+                token_type=token_type,
+                token=token,
+                client_fingerprint=client_fingerprint,
+            )
+        except TokenStoreUnavailableException:
+            if not self._accept_without_store(token_type):
+                raise
+            logger.warning(f"Хранилище сессий недоступно, токен доступа пользователя {user_id} принят по подписи")
+            return True
+
+    async def verify_tokens(
+            self,
+            tokens: list[tuple[str, int | str, Literal["access", "refresh"], str, dict]],
+    ) -> list[bool]:
+        """
+        Проверить несколько токенов, обращаясь к хранилищу одним запросом
+
+        Args:
+            tokens: Токен, ID пользователя, тип токена, ID сессии и декодированный токен
+
+        Returns:
+            Результаты проверки в порядке токенов
+        """
+        by_epochs = [self.epoch_cache is not None and token_type == "access" for _, _, token_type, _, _ in tokens]
+        token_epochs = [
+            self._get_token_epochs(payload) if epochs else None
+            for (_, _, _, _, payload), epochs in zip(tokens, by_epochs)
+        ]
+        stored_tokens = [
+            (user_id, token_type, token, client_fingerprint)
+            for (token, user_id, token_type, client_fingerprint, _), epochs in zip(tokens, by_epochs)
+            if not epochs
+        ]
+        try:
+            stored_results = iter(
+                await self._call_store(self.token_store.are_tokens_verified, stored_tokens)
+                if stored_tokens
+                else []
+            )
+            epoch_results = iter(
+                await self._get_many_epochs([
+                    (user_id, client_fingerprint, session_token_epochs)
+                    for (_, user_id, _, client_fingerprint, _), session_token_epochs in zip(tokens, token_epochs)
+                    if session_token_epochs is not None
+                ])
+            )
+            results = []
+            for epochs, session_token_epochs in zip(by_epochs, token_epochs):
+                if not epochs:
+                    results.append(next(stored_results))
+                elif session_token_epochs is None:
+                    results.append(False)
+                else:
+                    results.append(self._is_epoch_current(session_token_epochs, next(epoch_results)))
+            return results
+        except TokenStoreUnavailableException:
+            results = [self._accept_without_store(token_type) for _, _, token_type, _, _ in tokens]
+            if not any(results):
+                raise
+            logger.warning(f"Хранилище сессий недоступно, токены доступа ({sum(results)}) приняты по подписи")
+            return results
+
+    def _accept_without_store(self, token_type: Literal["access", "refresh"]) -> bool:
+        """
+        Можно ли принять токен без проверки в хранилище (политика grace)
+
+        Подпись и срок действия токена к этому моменту уже проверены. Токены
+        доступа принимаются не дольше REDIS_BREAKER_GRACE_SECONDS с момента
+        размыкания предохранителя, refresh-токены не принимаются никогда.
+        """
+        if (
+                token_type != "access"
+                or settings.REDIS_BREAKER_POLICY != 'grace'
+                or self.store_breaker is None
+                or self.store_breaker.open_duration() > settings.REDIS_BREAKER_GRACE_SECONDS
+        ):
+            return False
+        metrics.inc("token_verify_degraded_total")
+        return True
 
     async def invalidate_token(
             self,
@@ -134,7 +372,12 @@ class TokenService:
             token_type: Тип токена (access или refresh)
             client_fingerprint: ID сессии
         """
-        await self.redis_manager.invalidate_token(
+        if self.epoch_cache is not None and token_type == "access":
+            await self._bump_session_epoch(user_id, client_fingerprint)
+            return
+
+        await self._call_store(
+            self.token_store.invalidate_token,
             subject=user_id,
             token_type=token_type,
             client_fingerprint=client_fingerprint,
@@ -152,7 +395,11 @@ class TokenService:
             user_id: ID пользователя
             client_fingerprint: ID сессии
         """
-        await self.redis_manager.invalidate_token_pair(
+        if self.epoch_cache is not None:
+            await self._bump_session_epoch(user_id, client_fingerprint)
+
+        await self._call_store(
+            self.token_store.invalidate_token_pair,
             subject=user_id,
             client_fingerprint=client_fingerprint,
         )
@@ -167,17 +414,177 @@ class TokenService:
         Args:
             user_id: ID пользователя
         """
-        await self.redis_manager.invalidate_all_user_tokens(user_id)
+        if self.epoch_cache is not None:
+            await self._call_store(self.token_store.bump_user_epoch, user_id)
+            self.epoch_cache.invalidate(user_id)
+
+        await self._call_store(self.token_store.invalidate_all_user_tokens, user_id)
+
+    @staticmethod
+    def _get_token_epochs(payload: dict) -> tuple[int, int] | None:
+        """Получить эпохи пользователя и сессии из токена доступа"""
+        epochs = payload.get("epu"), payload.get("eps")
+        if not all(isinstance(epoch, int) for epoch in epochs):
+            return None
+        return epochs
+
+    @staticmethod
+    def _is_epoch_current(token_epochs: tuple[int, int], epochs: tuple[int, int]) -> bool:
+        """
+        Не отозван ли токен: отозваны только токены с эпохой старше сохраненной
+
+        Токен с эпохой новее сохраненной выпущен после отзыва (например, другим
+        воркером, пока в локальном кеше оставалась прежняя эпоха).
+        """
+        return token_epochs[0] >= epochs[0] and token_epochs[1] >= epochs[1]
+
+    @staticmethod
+    def _is_epoch_newer(token_epochs: tuple[int, int], epochs: tuple[int, int]) -> bool:
+        """Новее ли эпоха токена эпохи из кеша хотя бы по одной составляющей"""
+        return token_epochs[0] > epochs[0] or token_epochs[1] > epochs[1]
+
+    async def _get_epochs(
+            self,
+            user_id: int | str,
+            client_fingerprint: str,
+            token_epochs: tuple[int, int] | None = None,
+    ) -> tuple[int, int]:
+        """
+        Получить эпохи пользователя и сессии, используя локальный кеш
+
+        Если эпоха токена новее закешированной, кеш устарел и эпохи запрашиваются из хранилища.
+        """
+        epochs = self.epoch_cache.get(user_id, client_fingerprint)
+        if epochs is None or (token_epochs is not None and self._is_epoch_newer(token_epochs, epochs)):
+            epochs = await self._call_store(
+                self.token_store.get_epochs,
+                subject=user_id,
+                client_fingerprint=client_fingerprint,
+            )
+            self.epoch_cache.set(user_id, client_fingerprint, epochs)
+        return epochs
+
+    async def _get_many_epochs(
+            self,
+            sessions: list[tuple[int | str, str, tuple[int, int]]],
+    ) -> list[tuple[int, int]]:
+        """
+        Получить эпохи нескольких сессий: промахи локального кеша запрашиваются одним запросом
+
+        Args:
+            sessions: ID пользователя, ID сессии и эпохи из токена доступа
+        """
+        epochs = []
+        for user_id, client_fingerprint, token_epochs in sessions:
+            session_epochs = self.epoch_cache.get(user_id, client_fingerprint)
+            if session_epochs is not None and self._is_epoch_newer(token_epochs, session_epochs):
+                session_epochs = None
+            epochs.append(session_epochs)
+        missing = list(dict.fromkeys(
+            (str(user_id), client_fingerprint)
+            for (user_id, client_fingerprint, _), session_epochs in zip(sessions, epochs)
+            if session_epochs is None
+        ))
+        if missing:
+            fetched = dict(zip(missing, await self._call_store(self.token_store.get_many_epochs, missing)))
+            for session, session_epochs in fetched.items():
+                self.epoch_cache.set(*session, session_epochs)
+            epochs = [
+                session_epochs if session_epochs is not None else fetched[(str(user_id), client_fingerprint)]
+                for (user_id, client_fingerprint, _), session_epochs in zip(sessions, epochs)
+            ]
+        return epochs
+
+    async def _bump_session_epoch(
+            self,
+            user_id: int | str,
+            client_fingerprint: str,
+    ) -> None:
+        """Отозвать токены доступа сессии, увеличив ее эпоху"""
+        await self._call_store(
+            self.token_store.bump_session_epoch,
+            subject=user_id,
+            client_fingerprint=client_fingerprint,
+            expire_time=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60,
+        )
+        self.epoch_cache.invalidate(user_id, client_fingerprint)
+
+    def _get_verification_key(self, token: str):
+        """Получить ключ для проверки подписи токена"""
+        if self.key_ring is None:
+            return settings.SECRET_KEY
+
+        kid = self.codec.get_unverified_header(token).get("kid")
+        key = self.key_ring.get_verification_key(kid) if kid else None
+        if key is None:
+            raise JWTError("Неизвестный ключ подписи токена")
+        return key
+
+    def jwks(self) -> dict:
+        """Публичные ключи для проверки токенов в формате JWKS"""
+        if self.key_ring is None:
+            return {"keys": []}
+        return self.key_ring.jwks()
 
     def decode_token(self, token: str) -> dict:
         """Декодировать токен"""
-        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        if self.payload_cache is not None:
+            payload = self.payload_cache.get(token)
+            if payload is not None:
+                return payload
+
+        payload = self.codec.decode(token, self._get_verification_key(token))
+
+        if self.payload_cache is not None:
+            self.payload_cache.set(token, payload)
+        return payload
 
 class PasswordService:
     """Сервис для работы с паролями"""
 
     def __init__(self):
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self.pwd_context = build_crypt_context(
+            scheme=settings.PASSWORD_HASH_SCHEME,
+            rounds=settings.PASSWORD_HASH_ROUNDS,
+        )
+        self.executor = PasswordHashExecutor(
+            executor_type=settings.PASSWORD_HASH_EXECUTOR,
+            max_workers=settings.PASSWORD_HASH_MAX_WORKERS,
+            max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+        )
+
+    def configure(self, rounds: int, pin_rounds: bool = True) -> None:
+        """
+        Задать стоимость хеширования (например, по результатам калибровки)
+
+        Args:
+            rounds: Стоимость хеширования
+            pin_rounds: Считать устаревшими и хеши с большей стоимостью
+        """
+        self.pwd_context = build_crypt_context(
+            scheme=settings.PASSWORD_HASH_SCHEME,
+            rounds=rounds,
+            pin_rounds=pin_rounds,
+        )
+
+    async def calibrate(self) -> int:
+        """Откалибровать стоимость хеширования под бюджет задержки на текущем железе"""
+        loop = asyncio.get_running_loop()
+        rounds = await loop.run_in_executor(
+            None,
+            calibrate_rounds,
+            settings.PASSWORD_HASH_SCHEME,
+            settings.PASSWORD_HASH_TARGET_MS,
+        )
+        # Воркеры калибруются независимо и могут получить соседние значения,
+        # поэтому более дорогие хеши не пересчитываются, чтобы не было перехеширования по кругу
+        self.configure(rounds=rounds, pin_rounds=False)
+        return rounds
+
+    @property
+    def context_config(self) -> str:
+        """Сериализованная конфигурация CryptContext для передачи в пул"""
+        return self.pwd_context.to_string()
 
     def get_password_hash(self, password: str) -> str:
         """Получить хеш пароля"""
@@ -197,6 +604,93 @@ class PasswordService:
             return None
         return user
 
+    async def get_password_hash_async(self, password: str) -> str:
+        """Получить хеш пароля вне event loop"""
+        return await self.executor.run(hash_password, self.context_config, password)
+
+    async def verify_password_async(self, plain_password: str, hashed_password: str) -> bool:
+        """Проверить пароль вне event loop"""
+        return await self.executor.run(
+            verify_password,
+            self.context_config,
+            plain_password,
+            hashed_password,
+        )
+
+    async def authenticate_user_async(self, user: User, password: str) -> User | None:
+        """
+        Аутентифицировать пользователя, проверяя пароль вне event loop
+
+        Если хеш пароля создан с устаревшими параметрами, он пересчитывается и сохраняется.
+        """
+        if not user:
+            return None
+
+        verified, new_hash = await self.executor.run(
+            verify_and_update_password,
+            self.context_config,
+            password,
+            user.password,
+        )
+        if not verified:
+            return None
+
+        if new_hash:
+            await self._update_password_hash(user, new_hash)
+        return user
+
+    async def _update_password_hash(self, user: User, new_hash: str) -> None:
+        """Сохранить пересчитанный хеш пароля, не прерывая вход при ошибке"""
+        try:
+            async with async_session_maker() as session:
+                await UsersDAO(session).update(
+                    filters=UserIdModel(id=user.id),
+                    values=SUserPasswordUpdate(password=new_hash),
+                )
+                await session.commit()
+            user.password = new_hash
+            logger.info(f"Хеш пароля пользователя {user.id} пересчитан")
+        except SQLAlchemyError as e:
+            logger.warning(f"Не удалось сохранить пересчитанный хеш пароля пользователя {user.id}: {e}")
+
+    def shutdown(self) -> None:
+        """Остановить пул хеширования"""
+        self.executor.shutdown()
+
+
+class RegistrationGuard:
+    """
+    Резервирование логинов на время регистрации
+
+    Не дает параллельным запросам с одинаковым логином одновременно
+    проходить проверки и тратить ресурсы на хеширование пароля.
+    """
+
+    def __init__(self):
+        self._in_progress: set[str] = set()
+
+    @asynccontextmanager
+    async def reserve(self, username: str) -> AsyncIterator[None]:
+        """
+        Зарезервировать логин на время регистрации
+
+        Args:
+            username: Логин пользователя
+        """
+        if username in self._in_progress:
+            raise UserAlreadyExistsException()
+
+        self._in_progress.add(username)
+        try:
+            yield
+        finally:
+            self._in_progress.discard(username)
+
 
 token_service = TokenService()
 password_service = PasswordService()
+registration_guard = RegistrationGuard()
+# Без Redis попытки входа считаются в памяти процесса
+login_rate_limiter = LoginRateLimiter(
+    token_service.token_store if isinstance(token_service.token_store, RedisTokenManager) else None
+)
@@ -22,11 +22,13 @@ class BaseDAO(Generic[T]):
             raise ValueError("Модель должна быть указана в дочернем классе")
 
     async def find_one_or_none_by_id(self, data_id: int):
-        """Поиск одной записи по ID"""
+        """
+        Поиск одной записи по ID
+
+        Запись, уже загруженная в сессию, берется из карты идентичности без запроса к БД.
+        """
         try:
-            query = select(self.model).filter_by(id=data_id)
-            result = await self._session.execute(query)
-            record = result.scalar_one_or_none()
+            record = await self._session.get(self.model, data_id)
             log_message = f"Запись {self.model.__name__} с ID {data_id} {'найдена' if record else 'не найдена'}."
             logger.info(log_message)
             return record
@@ -34,6 +36,25 @@ class BaseDAO(Generic[T]):
             logger.error(f"Ошибка при поиске записи с ID {data_id}: {e}")
             raise
 
+    async def find_all_by_ids(self, data_ids: List[int]):
+        """
+        Поиск записей по списку ID одним запросом
+
+        Args:
+            data_ids: Список ID
+        """
+        if not data_ids:
+            return []
+        try:
+            query = select(self.model).where(self.model.id.in_(set(data_ids)))
+            result = await self._session.execute(query)
+            records = result.scalars().all()
+            logger.info(f"Найдено {len(records)} записей {self.model.__name__} из {len(set(data_ids))} запрошенных ID.")
+            return records
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при поиске записей по списку ID: {e}")
+            raise
+
     async def find_one_or_none(self, filters: BaseModel):
         """
         Поиск одной записи по фильтрам
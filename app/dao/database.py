@@ -6,10 +6,12 @@ from typing import Annotated
 from sqlalchemy import NullPool
 from sqlalchemy import func, TIMESTAMP, Integer, inspect
 from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase, declared_attr
-from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import AsyncAttrs, AsyncEngine, async_sessionmaker, create_async_engine, AsyncSession
 from loguru import logger
 
 from app.config import settings
+from app.dao.pool_metrics import InstrumentedAsyncQueuePool, instrument_pool
+from app.dao.session import ReleasingAsyncSession
 
 if settings.MODE == 'TEST':
     DATABASE_URL = (
@@ -34,7 +36,13 @@ else:
         f'{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@'
         f'{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}'
     )
-    params = {}
+    params = {
+        'poolclass': InstrumentedAsyncQueuePool,
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+    }
     
     REDIS_URL = (
         f'redis://:{settings.REDIS_PASSWORD}@'
@@ -46,8 +54,27 @@ else:
 logger.info(f'DATABASE_URL: {DATABASE_URL}')
 logger.info(f'REDIS_URL: {REDIS_URL}')
 
-engine = create_async_engine(url=DATABASE_URL, **params)
+
+
+def create_database_engine(url: str, metrics_name: str = "db") -> AsyncEngine:
+    """Создать движок БД с настройками пула и метриками"""
+    database_engine = create_async_engine(
+        url=url,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            'statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE,
+            'prepared_statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE,
+        },
+        **params,
+    )
+    instrument_pool(database_engine, metrics_name)
+    return database_engine
+
+
+engine = create_database_engine(DATABASE_URL)
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+# Сессии на чтение: движок (основной узел или реплика) передается при создании
+async_read_session_maker = async_sessionmaker(class_=ReleasingAsyncSession, expire_on_commit=False)
 str_uniq = Annotated[str, mapped_column(unique=True, nullable=False)]
 
 
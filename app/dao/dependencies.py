@@ -1,29 +1,36 @@
 from typing import AsyncGenerator
 
+from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.dao.database import async_session_maker
 
+from app.dao.unit_of_work import UnitOfWork
 
-async def get_session_with_commit() -> AsyncGenerator[AsyncSession, None]:
+
+async def get_unit_of_work() -> AsyncGenerator[UnitOfWork, None]:
+    """
+    Единица работы запроса.
+
+    FastAPI кеширует зависимость в пределах запроса, поэтому все зависимости
+    и обработчик получают одни и те же сессии.
+    """
+    async with UnitOfWork() as uow:
+        yield uow
+
+
+async def get_session_with_commit(
+        uow: UnitOfWork = Depends(get_unit_of_work),
+) -> AsyncGenerator[AsyncSession, None]:
     """Асинхронная сессия с автоматическим коммитом."""
-    async with async_session_maker() as session:
-        try:
-            yield session
-            await session.commit()
-        except Exception:
-            await session.rollback()
-            raise
-        finally:
-            await session.close()
-
-
-async def get_session_without_commit() -> AsyncGenerator[AsyncSession, None]:
-    """Асинхронная сессия без автоматического коммита."""
-    async with async_session_maker() as session:
-        try:
-            yield session
-        except Exception:
-            await session.rollback()
-            raise
-        finally:
-            await session.close()
+    yield uow.write_session
+    await uow.commit()
+
+
+async def get_session_without_commit(
+        uow: UnitOfWork = Depends(get_unit_of_work),
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Асинхронная сессия без автоматического коммита (только чтение, по возможности с реплики).
+
+    Соединение берется из пула только на время каждого запроса к БД.
+    """
+    yield uow.read_session
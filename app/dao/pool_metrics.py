@@ -0,0 +1,73 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.metrics import metrics
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, измеряющий ожидание свободного соединения
+
+    У пула нет события начала выдачи соединения, поэтому время ожидания
+    (включая открытие нового соединения сверх pool_size) измеряется вокруг
+    получения соединения из очереди.
+    """
+
+    metrics_name = "db"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe(f"{self.metrics_name}_pool_checkout_wait_seconds", time.perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+
+def instrument_pool(engine: AsyncEngine, name: str = "db") -> None:
+    """
+    Отдавать метрики пула соединений движка
+
+    Число выданных соединений, переполнение и размер пула вычисляются в момент
+    сбора метрик, открытия, выдачи и инвалидации соединений считаются по событиям пула.
+
+    Args:
+        engine: Асинхронный движок SQLAlchemy
+        name: Префикс метрик
+    """
+    pool = engine.sync_engine.pool
+    if isinstance(pool, InstrumentedAsyncQueuePool):
+        pool.metrics_name = name
+        metrics.describe(f"{name}_pool_checkout_wait_seconds", "Время ожидания соединения из пула, секунды")
+
+    if isinstance(pool, QueuePool):
+        metrics.describe(f"{name}_pool_checked_out", "Число выданных соединений пула")
+        metrics.describe(f"{name}_pool_overflow", "Число соединений сверх pool_size")
+        metrics.describe(f"{name}_pool_size", "Размер пула соединений")
+        # engine.dispose() заменяет пул, поэтому значения берутся у текущего пула движка
+        metrics.register_gauge(f"{name}_pool_checked_out", lambda: engine.sync_engine.pool.checkedout())
+        metrics.register_gauge(f"{name}_pool_overflow", lambda: max(engine.sync_engine.pool.overflow(), 0))
+        metrics.register_gauge(f"{name}_pool_size", lambda: engine.sync_engine.pool.size())
+
+    metrics.describe(f"{name}_pool_connects_total", "Число открытых соединений с БД")
+    metrics.describe(f"{name}_pool_checkouts_total", "Число выдач соединений из пула")
+    metrics.describe(f"{name}_pool_invalidations_total", "Число соединений, закрытых из-за ошибок")
+
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.inc(f"{name}_pool_connects_total")
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.inc(f"{name}_pool_checkouts_total")
+
+    @event.listens_for(pool, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.inc(f"{name}_pool_invalidations_total")
@@ -0,0 +1,219 @@
+import asyncio
+
+from loguru import logger
+from redis.asyncio import BlockingConnectionPool, Redis, RedisCluster
+from redis.asyncio.connection import parse_url
+from redis.asyncio.retry import Retry
+from redis.asyncio.sentinel import Sentinel
+from redis.backoff import EqualJitterBackoff
+from redis.exceptions import ConnectionError, RedisError, TimeoutError
+from redis.utils import HIREDIS_AVAILABLE
+
+from app.config import settings
+from app.dao.database import REDIS_URL
+from app.metrics import metrics
+
+
+async def wait_for_replicas(client: Redis, num_replicas: int, timeout_ms: int) -> None:
+    """
+    Дождаться подтверждения записей соединения репликами (WAIT)
+
+    WAIT учитывает только записи своего соединения, поэтому client - клиент
+    с одним соединением (Redis.client()), через который выполнена запись.
+    Команда отправляется в соединение напрямую, без повторов клиента: запись
+    к этому моменту уже выполнена и повторяться не должна. Если реплики не
+    подтвердили запись, это только фиксируется в логе и метрике.
+
+    Args:
+        client: Клиент с одним соединением, выполнивший запись
+        num_replicas: Число реплик, подтверждение которых ожидается
+        timeout_ms: Время ожидания в миллисекундах
+    """
+    connection = client.connection
+    try:
+        await connection.send_command("WAIT", num_replicas, timeout_ms)
+        acked = int(await connection.read_response())
+    except asyncio.CancelledError:
+        # Соединение с непрочитанным ответом не должно вернуться в пул
+        await connection.disconnect()
+        raise
+    except RedisError as e:
+        await connection.disconnect()
+        metrics.inc("redis_replica_wait_timeouts_total")
+        logger.warning(f"Не удалось дождаться подтверждения записи репликами Redis: {e}")
+        return
+
+    if acked < num_replicas:
+        metrics.inc("redis_replica_wait_timeouts_total")
+        logger.warning(
+            f"Запись подтвердили {acked} из {num_replicas} реплик Redis "
+            f"за {timeout_ms} мс: отстающие реплики могут принимать отозванные токены"
+        )
+
+
+class RedisClientManager:
+    """
+    Общий клиент Redis поверх настраиваемого пула соединений
+
+    При REDIS_CLUSTER_MODE создается клиент Redis Cluster с пулом на каждый узел.
+    При REDIS_SENTINEL_NODES основной узел и реплики определяются через Sentinel,
+    иначе реплики для чтения задаются списком REDIS_REPLICA_URLS.
+
+    Клиент создается при первом обращении (в том числе при старте приложения
+    в lifespan), прогревается заранее открытыми соединениями и закрывается
+    вместе с пулом при остановке приложения.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self._client: Redis | RedisCluster | None = None
+        self._sentinel: Sentinel | None = None
+        self._replicas: list[Redis] | None = None
+        self._replica_index = 0
+
+    @staticmethod
+    def _get_connection_options() -> dict:
+        """Получить общие параметры соединений по настройкам"""
+        return dict(
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+            socket_keepalive=True,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            retry=Retry(
+                EqualJitterBackoff(
+                    cap=settings.REDIS_RETRY_BACKOFF_CAP,
+                    base=settings.REDIS_RETRY_BACKOFF_BASE,
+                ),
+                settings.REDIS_RETRY_ATTEMPTS,
+            ),
+            retry_on_error=[ConnectionError, TimeoutError],
+            decode_responses=False,
+        )
+
+    def _get_sentinel(self) -> Sentinel:
+        """Получить клиент Sentinel"""
+        if self._sentinel is None:
+            nodes = [
+                (host, int(port))
+                for host, port in (node.rsplit(':', 1) for node in settings.REDIS_SENTINEL_NODES)
+            ]
+            url_options = parse_url(self.url)
+            self._sentinel = Sentinel(
+                nodes,
+                password=url_options.get('password'),
+                db=url_options.get('db', 0),
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                **self._get_connection_options(),
+            )
+        return self._sentinel
+
+    def _create_client(self) -> Redis | RedisCluster:
+        """Создать клиент Redis по настройкам"""
+        if settings.REDIS_CLUSTER_MODE:
+            return RedisCluster.from_url(
+                self.url,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                **self._get_connection_options(),
+            )
+
+        if settings.REDIS_SENTINEL_NODES:
+            return self._get_sentinel().master_for(settings.REDIS_SENTINEL_MASTER)
+
+        pool = BlockingConnectionPool.from_url(
+            self.url,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            **self._get_connection_options(),
+        )
+        return Redis(connection_pool=pool)
+
+    @property
+    def client(self) -> Redis | RedisCluster:
+        """Получить общий клиент Redis"""
+        if self._client is None:
+            self._client = self._create_client()
+            logger.info(
+                f"Создан {'кластерный ' if settings.REDIS_CLUSTER_MODE else ''}клиент Redis "
+                f"(max_connections={settings.REDIS_MAX_CONNECTIONS}, "
+                f"парсер: {'hiredis' if HIREDIS_AVAILABLE else 'python'})"
+            )
+        return self._client
+
+    def _create_replicas(self) -> list[Redis]:
+        """Создать клиенты реплик по настройкам"""
+        if settings.REDIS_CLUSTER_MODE:
+            return []
+
+        if settings.REDIS_SENTINEL_NODES:
+            # Пул Sentinel сам распределяет соединения по репликам
+            return [self._get_sentinel().slave_for(settings.REDIS_SENTINEL_MASTER)]
+
+        return [
+            Redis(connection_pool=BlockingConnectionPool.from_url(
+                url,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                timeout=settings.REDIS_POOL_TIMEOUT,
+                **self._get_connection_options(),
+            ))
+            for url in settings.REDIS_REPLICA_URLS
+        ]
+
+    @property
+    def replica_wait_count(self) -> int:
+        """Число реплик, подтверждение записи которыми ожидается (0 - чтение с реплик не используется)"""
+        if settings.REDIS_CLUSTER_MODE:
+            return 0
+        if settings.REDIS_REPLICA_WAIT_COUNT is not None:
+            return settings.REDIS_REPLICA_WAIT_COUNT
+        if settings.REDIS_SENTINEL_NODES:
+            return 1
+        return len(settings.REDIS_REPLICA_URLS)
+
+    @property
+    def replica_client(self) -> Redis | None:
+        """Получить клиент реплики для чтения (по кругу) или None, если реплики не настроены"""
+        if self._replicas is None:
+            self._replicas = self._create_replicas()
+            if self._replicas:
+                logger.info(f"Чтение токенов распределяется по репликам Redis: {len(self._replicas)}")
+        if not self._replicas:
+            return None
+
+        self._replica_index = (self._replica_index + 1) % len(self._replicas)
+        return self._replicas[self._replica_index]
+
+    async def warm_up(self, connections: int) -> None:
+        """Заранее открыть соединения пула, чтобы первые запросы не ждали подключения"""
+        connections = min(connections, settings.REDIS_MAX_CONNECTIONS)
+        if connections <= 0:
+            return
+        try:
+            await asyncio.gather(*[self.client.ping() for _ in range(connections)])
+        except RedisError as e:
+            # Недоступность Redis при старте не мешает запуску: соединения откроются по запросу
+            logger.warning(f"Не удалось прогреть пул соединений Redis: {e}")
+            return
+        logger.info(f"Пул соединений Redis прогрет: {connections} соединений")
+
+    async def close(self) -> None:
+        """Закрыть клиенты и все соединения пулов"""
+        replicas, self._replicas = self._replicas or [], None
+        for replica in replicas:
+            await replica.aclose(close_connection_pool=True)
+
+        if self._sentinel is not None:
+            sentinel, self._sentinel = self._sentinel, None
+            for sentinel_client in sentinel.sentinels:
+                await sentinel_client.aclose()
+
+        if self._client is None:
+            return
+        client, self._client = self._client, None
+        if isinstance(client, RedisCluster):
+            await client.aclose()
+        else:
+            await client.aclose(close_connection_pool=True)
+        logger.info("Пул соединений Redis закрыт")
+
+
+redis_client_manager = RedisClientManager(REDIS_URL)
@@ -0,0 +1,101 @@
+import asyncio
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+from app.dao.database import create_database_engine, engine
+from app.metrics import metrics
+
+
+# Отставание реплики в секундах; реплика, воспроизведшая весь полученный WAL,
+# не отстает, даже если на основном узле давно не было транзакций
+REPLICATION_LAG_QUERY = text("""
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+""")
+
+
+class ReplicaRouter:
+    """
+    Выбор движка БД для сессий только на чтение
+
+    Реплики из DB_REPLICA_URLS выбираются по кругу. Реплика исключается,
+    если запрос к ней завершился ошибкой соединения или ее отставание превышает
+    DB_REPLICA_MAX_LAG_SECONDS, и возвращается после успешной проверки
+    (раз в DB_REPLICA_CHECK_INTERVAL секунд). Если доступных реплик нет,
+    чтение идет с основного узла.
+    """
+
+    def __init__(self, primary: AsyncEngine, urls: list[str]):
+        self.primary = primary
+        self.replicas = [
+            create_database_engine(url, metrics_name=f"db_replica{i}")
+            for i, url in enumerate(urls)
+        ]
+        self._healthy = [True] * len(self.replicas)
+        self._index = 0
+
+        metrics.describe("db_replicas_healthy", "Число реплик БД, доступных для чтения")
+        metrics.describe("db_replica_fallbacks_total", "Число сессий на чтение, направленных на основной узел")
+        metrics.register_gauge("db_replicas_healthy", lambda: sum(self._healthy))
+        if self.replicas:
+            logger.info(f"Чтение из БД распределяется по репликам: {len(self.replicas)}")
+
+    def get_engine(self) -> AsyncEngine:
+        """Получить движок следующей доступной реплики или основного узла"""
+        for _ in range(len(self.replicas)):
+            self._index = (self._index + 1) % len(self.replicas)
+            if self._healthy[self._index]:
+                return self.replicas[self._index]
+
+        if self.replicas:
+            metrics.inc("db_replica_fallbacks_total")
+        return self.primary
+
+    def mark_failed(self, replica: AsyncEngine) -> None:
+        """Исключить реплику до следующей успешной проверки"""
+        if replica is self.primary:
+            return
+        index = self.replicas.index(replica)
+        if self._healthy[index]:
+            self._healthy[index] = False
+            logger.warning(f"Реплика БД {index} исключена из чтения после ошибки соединения")
+
+    async def _get_lag(self, replica: AsyncEngine) -> float:
+        """Получить отставание реплики в секундах"""
+        async with replica.connect() as connection:
+            return float((await connection.execute(REPLICATION_LAG_QUERY)).scalar_one())
+
+    async def check(self) -> None:
+        """Проверить доступность и отставание всех реплик"""
+        for index, replica in enumerate(self.replicas):
+            try:
+                lag = await asyncio.wait_for(self._get_lag(replica), settings.DB_POOL_TIMEOUT)
+            except (SQLAlchemyError, OSError, asyncio.TimeoutError) as e:
+                healthy, reason = False, f"ошибка проверки: {e}"
+            else:
+                healthy = lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+                reason = f"отставание {lag:.1f} с"
+
+            if healthy != self._healthy[index]:
+                logger.warning(f"Реплика БД {index} {'возвращена в' if healthy else 'исключена из'} чтение: {reason}")
+            self._healthy[index] = healthy
+
+    async def run_health_checks(self) -> None:
+        """Периодически проверять реплики"""
+        while True:
+            await self.check()
+            await asyncio.sleep(settings.DB_REPLICA_CHECK_INTERVAL)
+
+    async def dispose(self) -> None:
+        """Закрыть пулы соединений реплик"""
+        for replica in self.replicas:
+            await replica.dispose()
+
+
+replica_router = ReplicaRouter(engine, settings.DB_REPLICA_URLS)
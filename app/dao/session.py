@@ -0,0 +1,48 @@
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+
+class ReleasingAsyncSession(AsyncSession):
+    """
+    Сессия на чтение, возвращающая соединение в пул после каждого запроса
+
+    Соединение берется из пула только при первом запросе и возвращается сразу
+    после получения результата (результаты asyncpg буферизуются целиком),
+    поэтому не удерживается на время работы с Redis или хеширования пароля.
+    Сессия привязывается к движку в режиме AUTOCOMMIT, чтобы запросы
+    не оборачивались в BEGIN/COMMIT. Пока в сессии есть несохраненные
+    изменения, соединение не освобождается.
+    """
+
+    async def _release_connection(self) -> None:
+        """Вернуть соединение в пул, сохранив загруженные объекты"""
+        if self.in_transaction() and not (self.new or self.dirty or self.deleted):
+            await self.commit()
+
+    async def execute(self, *args, **kwargs) -> Any:
+        result = await super().execute(*args, **kwargs)
+        await self._release_connection()
+        return result
+
+    async def scalar(self, *args, **kwargs) -> Any:
+        result = await super().scalar(*args, **kwargs)
+        await self._release_connection()
+        return result
+
+    async def get(self, *args, **kwargs) -> Any:
+        result = await super().get(*args, **kwargs)
+        await self._release_connection()
+        return result
+
+
+_autocommit_engines: dict[AsyncEngine, AsyncEngine] = {}
+
+
+def get_autocommit_engine(engine: AsyncEngine) -> AsyncEngine:
+    """Получить движок с тем же пулом в режиме AUTOCOMMIT"""
+    autocommit_engine = _autocommit_engines.get(engine)
+    if autocommit_engine is None:
+        autocommit_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+        _autocommit_engines[engine] = autocommit_engine
+    return autocommit_engine
@@ -0,0 +1,81 @@
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.dao.database import async_read_session_maker, async_session_maker
+from app.dao.replicas import replica_router
+from app.dao.session import get_autocommit_engine
+
+
+class UnitOfWork:
+    """
+    Единица работы запроса
+
+    Все зависимости и обработчики запроса получают сессии из одного экземпляра,
+    поэтому пользователь, загруженный при проверке токена, берется обработчиком
+    из карты идентичности сессии без повторного запроса к БД. Сессии создаются
+    при первом обращении: сессия на чтение (реплика или основной узел, соединение
+    только на время запроса) и сессия на запись (основной узел). После создания
+    сессии на запись чтение тоже идет через нее, так что запрос не держит
+    больше одного соединения и видит собственные изменения.
+    """
+
+    def __init__(self):
+        self._read_engine: AsyncEngine | None = None
+        self._read_session: AsyncSession | None = None
+        self._write_session: AsyncSession | None = None
+
+    @property
+    def read_session(self) -> AsyncSession:
+        """Сессия только на чтение"""
+        if self._write_session is not None:
+            return self._write_session
+        if self._read_session is None:
+            self._read_engine = replica_router.get_engine()
+            self._read_session = async_read_session_maker(bind=get_autocommit_engine(self._read_engine))
+        return self._read_session
+
+    @property
+    def write_session(self) -> AsyncSession:
+        """Сессия на запись в основной узел"""
+        if self._write_session is None:
+            self._write_session = async_session_maker()
+        return self._write_session
+
+    async def commit(self) -> None:
+        """Зафиксировать изменения сессии на запись"""
+        if self._write_session is not None:
+            await self._write_session.commit()
+
+    async def rollback(self, error: BaseException | None = None) -> None:
+        """
+        Откатить изменения сессий
+
+        Args:
+            error: Ошибка, из-за которой выполняется откат
+        """
+        # Реплика с ошибкой соединения исключается, следующие запросы читают с других узлов
+        if self._read_engine is not None and (
+                isinstance(error, OSError) or (isinstance(error, DBAPIError) and error.connection_invalidated)
+        ):
+            replica_router.mark_failed(self._read_engine)
+
+        for session in (self._read_session, self._write_session):
+            if session is not None:
+                await session.rollback()
+
+    async def close(self) -> None:
+        """Закрыть сессии и вернуть соединения в пул"""
+        for session in (self._read_session, self._write_session):
+            if session is not None:
+                await session.close()
+        self._read_session = self._write_session = None
+
+    async def __aenter__(self) -> "UnitOfWork":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc is not None:
+                await self.rollback(exc)
+        finally:
+            await self.close()
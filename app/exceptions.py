@@ -142,4 +142,42 @@ class TokenInvalidFormatException(HTTPException):
             status_code=self.status_code,
             detail=self.detail,
             headers=headers,
-        )
\ No newline at end of file
+        )
+
+# Очередь хеширования паролей переполнена
+class PasswordHashQueueFullException(HTTPException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    detail = 'Сервис перегружен, повторите попытку позже'
+
+    def __init__(self, headers: dict[str, str | int] = None):
+        super().__init__(
+            status_code=self.status_code,
+            detail=self.detail,
+            headers=headers or {'Retry-After': '1'},
+        )
+
+
+# Хранилище сессий недоступно
+class TokenStoreUnavailableException(HTTPException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    detail = 'Хранилище сессий временно недоступно, повторите попытку позже'
+
+    def __init__(self, headers: dict[str, str | int] = None):
+        super().__init__(
+            status_code=self.status_code,
+            detail=self.detail,
+            headers=headers or {'Retry-After': '1'},
+        )
+
+
+# Превышен лимит попыток входа
+class TooManyRequestsException(HTTPException):
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    detail = 'Слишком много попыток входа, повторите попытку позже'
+
+    def __init__(self, headers: dict[str, str | int] = None):
+        super().__init__(
+            status_code=self.status_code,
+            detail=self.detail,
+            headers=headers,
+        )
@@ -1,7 +1,9 @@
+import asyncio
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
 from fastapi import FastAPI, APIRouter
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from loguru import logger
@@ -9,17 +11,51 @@ from sqladmin import Admin
 
 from app.admin.role import RoleAdmin
 from app.admin.user import UserAdmin
+from app.config import settings
 from app.dao.database import engine
+from app.dao.redis import redis_client_manager
+from app.dao.replicas import replica_router
 from app.admin.auth import authentication_backend
-from app.auth.router import router as router_auth
+from app.auth.router import router as router_auth, well_known_router
+from app.auth.utils import password_service, token_service
+from app.metrics import metrics
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[dict, None]:
     """Управление жизненным циклом приложения."""
     logger.info("Инициализация приложения...")
+    if settings.TOKEN_STORE == 'redis':
+        await redis_client_manager.warm_up(settings.REDIS_WARM_CONNECTIONS)
+    if settings.PASSWORD_HASH_CALIBRATE_ON_STARTUP:
+        await password_service.calibrate()
+
+    key_rotation_task = None
+    if token_service.key_ring is not None:
+        await asyncio.to_thread(token_service.key_ring.rotate_if_due)
+        key_rotation_task = asyncio.create_task(token_service.key_ring.run_rotation())
+
+    replica_check_task = None
+    if replica_router.replicas:
+        replica_check_task = asyncio.create_task(replica_router.run_health_checks())
+
+    invalidation_listener_task = None
+    if token_service.token_store.near_cache is not None:
+        invalidation_listener_task = asyncio.create_task(
+            token_service.token_store.run_invalidation_listener()
+        )
+
     yield
     logger.info("Завершение работы приложения...")
+    if key_rotation_task is not None:
+        key_rotation_task.cancel()
+    if invalidation_listener_task is not None:
+        invalidation_listener_task.cancel()
+    if replica_check_task is not None:
+        replica_check_task.cancel()
+        await replica_router.dispose()
+    password_service.shutdown()
+    await redis_client_manager.close()
 
 
 def create_app() -> FastAPI:
@@ -66,8 +102,14 @@ def register_routers(app: FastAPI) -> None:
     # Корневой роутер
     root_router = APIRouter()
 
+    @root_router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def get_metrics() -> str:
+        """Метрики процесса в формате Prometheus"""
+        return metrics.render()
+
     # Подключение роутеров
     app.include_router(root_router, tags=["root"])
+    app.include_router(well_known_router, tags=["root"])
     app.include_router(router_auth, prefix='/auth', tags=['Auth'])
 
 
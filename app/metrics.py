@@ -0,0 +1,75 @@
+from collections import defaultdict
+from threading import Lock
+from typing import Callable
+
+
+class MetricsRegistry:
+    """
+    Простой реестр метрик процесса
+
+    Хранит счетчики, значения (gauge) и суммарные наблюдения (summary)
+    и отдает их в текстовом формате Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._counters: dict[str, float] = defaultdict(float)
+        self._gauges: dict[str, float] = {}
+        self._gauge_callbacks: dict[str, Callable[[], float]] = {}
+        self._summaries: dict[str, list[float]] = {}
+        self._descriptions: dict[str, str] = {}
+
+    def describe(self, name: str, description: str) -> None:
+        """Задать описание метрики (HELP)"""
+        self._descriptions[name] = description
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """Увеличить счетчик"""
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Установить текущее значение"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def register_gauge(self, name: str, callback: Callable[[], float]) -> None:
+        """Зарегистрировать значение, вычисляемое в момент сбора метрик"""
+        with self._lock:
+            self._gauge_callbacks[name] = callback
+
+    def observe(self, name: str, value: float) -> None:
+        """Добавить наблюдение (например, длительность операции в секундах)"""
+        with self._lock:
+            summary = self._summaries.setdefault(name, [0, 0.0, 0.0])
+            summary[0] += 1
+            summary[1] += value
+            summary[2] = max(summary[2], value)
+
+    def snapshot(self) -> dict[str, float]:
+        """Получить текущие значения всех метрик"""
+        with self._lock:
+            result = dict(self._counters)
+            result.update(self._gauges)
+            callbacks = dict(self._gauge_callbacks)
+            for name, (count, total, maximum) in self._summaries.items():
+                result[f"{name}_count"] = count
+                result[f"{name}_sum"] = total
+                result[f"{name}_max"] = maximum
+
+        for name, callback in callbacks.items():
+            result[name] = callback()
+        return result
+
+    def render(self) -> str:
+        """Отдать метрики в текстовом формате Prometheus"""
+        lines = []
+        for name, value in sorted(self.snapshot().items()):
+            description = self._descriptions.get(name)
+            if description:
+                lines.append(f"# HELP {name} {description}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
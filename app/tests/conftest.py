@@ -97,11 +97,19 @@ async def redis_client():
 
 
 @pytest.fixture(scope='module')
-def redis_token_manager(redis_client):
+async def redis_token_manager(redis_client):
     """Фикстура для создания RedisTokenManager с тестовым Redis-клиентом""" 
     manager = RedisTokenManager()
-    manager.redis_client = redis_client
-    return manager
+    # Менеджер токенов работает с бинарными ключами и значениями
+    manager.redis_client = redis.Redis(
+        connection_pool=redis.ConnectionPool(
+            **{**redis_client.connection_pool.connection_kwargs, 'decode_responses': False}
+        )
+    )
+    try:
+        yield manager
+    finally:
+        await manager.redis_client.aclose()
 
 
 @pytest.fixture(autouse=True, scope="module")
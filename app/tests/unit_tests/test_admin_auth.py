@@ -0,0 +1,85 @@
+import pytest
+from pytest_mock import MockerFixture
+from starlette.requests import Request
+from starlette.responses import RedirectResponse
+
+from app.admin.auth import authentication_backend
+from app.auth.dependencies import get_client_fingerprint
+from app.auth.models import User
+from app.auth.utils import token_service
+from app.exceptions import TokenExpiredException
+from app.tests.unit_tests.base import BaseUnitTest
+
+
+class TestAdminAuth(BaseUnitTest):
+    def setup_mocks(self, mocker: MockerFixture):
+        """
+        Создаем mock-объекты для тестов
+        - admin_user: Администратор
+        - mock_request: Запрос админ-панели с сессией
+        """
+        self.admin_user = User(id=5, username="admin", password="hash", role_id=4)
+
+        self.mock_request = mocker.Mock(spec=Request)
+        self.mock_request.session = {}
+        self.mock_request.headers = {"User-Agent": "admin-browser"}
+        self.mock_request.client = mocker.Mock()
+        self.mock_request.client.host = "127.0.0.1"
+        self.mock_request.url_for.return_value = "http://testserver/admin/login"
+
+        # Токен доступа в сессии истек, пара обновляется через refresh_token
+        mocker.patch('app.admin.auth.get_current_user', side_effect=TokenExpiredException())
+        mocker.patch(
+            'app.auth.dependencies.UsersDAO.find_one_or_none_by_id',
+            return_value=self.admin_user,
+        )
+
+    async def _login(self) -> dict:
+        """Создаем пару токенов и сохраняем ее в сессии"""
+        tokens = await token_service.create_tokens(
+            data={'sub': str(self.admin_user.id)},
+            client_fingerprint=get_client_fingerprint(self.mock_request),
+        )
+        self.mock_request.session.update(tokens)
+        return tokens
+
+    async def test_authenticate_rotates_expired_tokens(self):
+        """
+        Тест обновления пары токенов по refresh_token
+        """
+        tokens = await self._login()
+
+        assert await authentication_backend.authenticate(self.mock_request) is True
+        assert self.mock_request.session['refresh_token'] != tokens['refresh_token']
+
+        # Использованный refresh_token повторно не принимается
+        self.mock_request.session.update(tokens)
+        result = await authentication_backend.authenticate(self.mock_request)
+        assert isinstance(result, RedirectResponse)
+
+    async def test_authenticate_refuses_revoked_refresh_token(self):
+        """
+        Тест отказа по отозванному refresh_token
+        """
+        await self._login()
+        await token_service.invalidate_token_pair(
+            user_id=self.admin_user.id,
+            client_fingerprint=get_client_fingerprint(self.mock_request),
+        )
+
+        result = await authentication_backend.authenticate(self.mock_request)
+
+        assert isinstance(result, RedirectResponse)
+        assert result.headers['location'] == "http://testserver/admin/login"
+
+    @pytest.mark.parametrize("token_type", ["access", None])
+    async def test_authenticate_refuses_non_refresh_token(self, token_type: str | None):
+        """
+        Тест отказа, если вместо refresh_token передан токен другого типа или он отсутствует
+        """
+        tokens = await self._login()
+        self.mock_request.session['refresh_token'] = tokens['access_token'] if token_type else None
+
+        result = await authentication_backend.authenticate(self.mock_request)
+
+        assert isinstance(result, RedirectResponse)
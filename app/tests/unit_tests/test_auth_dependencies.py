@@ -5,15 +5,18 @@ from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.dependencies import (
+    check_introspection_secret,
     get_refresh_token,
     check_refresh_token,
     get_client_fingerprint,
+    get_client_ip,
     get_current_user,
     get_current_admin_user,
     get_current_superadmin_user,
 )
 from app.auth.utils import token_service
-from app.auth.models import User
+from app.auth.models import Role, User
+from app.config import settings
 from app.exceptions import (
     TokenNoFound,
     NoJwtException,
@@ -75,6 +78,15 @@ class TestAuthDependencies(BaseUnitTest):
         fingerprint = get_client_fingerprint(self.mock_request)
         assert isinstance(fingerprint, str)
         assert len(fingerprint) > 0
+
+    async def test_get_client_ip_unknown(self, mocker: MockerFixture):
+        """
+        Тест получения IP-адреса клиента, когда транспорт его не сообщает
+        """
+        self.setup_mocks(mocker)
+        self.mock_request.client = None
+        assert get_client_ip(self.mock_request) is None
+        assert get_client_fingerprint(self.mock_request)
     
     async def test_check_refresh_token_success(self, mocker: MockerFixture, session: AsyncSession):
         """
@@ -141,6 +153,27 @@ class TestAuthDependencies(BaseUnitTest):
         with pytest.raises(TokenExpiredException):
             await get_current_user(token, session, self.mock_client_fingerprint)
     
+    async def test_get_current_user_from_claims(self, mocker: MockerFixture):
+        """
+        Тест получения текущего пользователя из утверждений токена без запроса к БД
+        """
+        self.setup_mocks(mocker)
+        mocker.patch.object(settings, 'TOKEN_EMBED_CLAIMS', True)
+        user = User(id=5, username="admin", first_name="Ivan", last_name="Petrov", password="test", role_id=4)
+        user.role = Role(id=4, name="root")
+        db_session = mocker.AsyncMock(spec=AsyncSession)
+
+        tokens = await token_service.create_tokens(
+            data={"sub": str(user.id)},
+            client_fingerprint=self.mock_client_fingerprint,
+            claims=token_service.get_user_claims(user),
+        )
+        principal = await get_current_user(tokens["access_token"], db_session, self.mock_client_fingerprint)
+
+        assert (principal.id, principal.username, principal.role_id, principal.role.name) == (5, "admin", 4, "root")
+        assert await get_current_superadmin_user(principal) == principal
+        assert not db_session.mock_calls
+
     async def test_get_current_admin_user_success(self, mocker: MockerFixture):
         """
         Тест получения текущего администратора
@@ -175,4 +208,29 @@ class TestAuthDependencies(BaseUnitTest):
         self.setup_mocks(mocker)
         admin_user = User(id=1, username="admin", password="test", role_id=3)
         with pytest.raises(ForbiddenException):
-            await get_current_superadmin_user(admin_user)
\ No newline at end of file
+            await get_current_superadmin_user(admin_user)
+    @pytest.mark.parametrize(
+        "configured_secret,header,allowed",
+        [
+            ("gateway_secret", "gateway_secret", True),
+            ("gateway_secret", "wrong_secret", False),
+            ("gateway_secret", None, False),
+            (None, None, False),  # интроспекция отключена
+        ]
+    )
+    async def test_check_introspection_secret(
+        self,
+        mocker: MockerFixture,
+        configured_secret: str | None,
+        header: str | None,
+        allowed: bool,
+    ):
+        """
+        Тест проверки секрета шлюза для интроспекции токенов
+        """
+        mocker.patch.object(settings, 'INTROSPECTION_SECRET', configured_secret)
+        if allowed:
+            await check_introspection_secret(header)
+        else:
+            with pytest.raises(ForbiddenException):
+                await check_introspection_secret(header)
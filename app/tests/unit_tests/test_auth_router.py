@@ -4,25 +4,34 @@ from pytest_mock import MockerFixture
 
 from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession
+from redis.exceptions import ConnectionError as RedisConnectionError
 
-from app.auth.dependencies import get_client_fingerprint
+from app.auth.dependencies import build_client_fingerprint, get_client_fingerprint
 from app.tests.unit_tests.base import BaseUnitTest
-from app.auth.models import User
+from app.auth.models import Role, User
 from app.auth.router import (
     get_all_users,
     get_me,
     register_user,
     get_tokens,
     logout,
+    introspect_tokens,
+    process_refresh_token,
+    verify_for_proxy,
 )
 from app.auth.schemas import (
+    SIntrospectionItem,
+    SIntrospectionRequest,
+    SRefreshToken,
     SUserRegister,
 )
 from app.exceptions import (
     UserAlreadyExistsException,
     IncorrectEmailOrPasswordException,
+    NoJwtException,
 )
-from app.auth.utils import token_service
+from app.auth.utils import password_service, token_service
+from app.config import settings
 
 
 class TestAuthRouter(BaseUnitTest):
@@ -123,6 +132,28 @@ class TestAuthRouter(BaseUnitTest):
         with pytest.raises(UserAlreadyExistsException):
             await register_user(user_data, session)
 
+    async def test_register_user_already_exists_skips_hashing(self, mocker: MockerFixture, session: AsyncSession):
+        """
+        Тест того, что пароль не хешируется, если пользователь уже существует
+        """
+        self.setup_mocks(mocker)
+        user_data = SUserRegister(
+            username="newuser",
+            password="password123",
+            confirm_password="password123",
+            first_name="John",
+            last_name="Doe",
+        )
+        assert user_data.password == "password123"
+
+        hash_mock = mocker.patch.object(password_service, 'get_password_hash_async')
+        session.execute = mocker.AsyncMock(return_value=mocker.Mock(scalar_one_or_none=self.mock_user))
+
+        with pytest.raises(UserAlreadyExistsException):
+            await register_user(user_data, session)
+
+        hash_mock.assert_not_called()
+
     async def test_get_tokens_success(self, mocker: MockerFixture, session: AsyncSession):
         """
         Тест получения токенов
@@ -186,6 +217,21 @@ class TestAuthRouter(BaseUnitTest):
         assert result.id == self.mock_user.id
         assert result.username == self.mock_user.username
 
+    async def test_refresh_rejects_access_token(self, mocker: MockerFixture):
+        """
+        Тест того, что токен доступа, предъявленный для обновления, отклоняется и не отзывает сессию
+        """
+        self.setup_mocks(mocker)
+        fingerprint = get_client_fingerprint(self.mock_request)
+        tokens = await token_service.create_tokens(data={'sub': '1'}, client_fingerprint=fingerprint)
+        db_session = mocker.AsyncMock(spec=AsyncSession)
+
+        with pytest.raises(NoJwtException):
+            await process_refresh_token(db_session, SRefreshToken(refresh_token=tokens["access_token"]), self.mock_request)
+
+        assert not db_session.mock_calls
+        assert await token_service.verify_token(tokens["refresh_token"], '1', 'refresh', fingerprint)
+
     async def test_get_all_users_success(self, mocker: MockerFixture, session: AsyncSession):
         """
         Тест получения всех пользователей
@@ -197,3 +243,68 @@ class TestAuthRouter(BaseUnitTest):
         result = await get_all_users(session)
         assert len(result) == 2
         assert all(isinstance(user, User) for user in result)
+
+    async def test_introspect_tokens(self, mocker: MockerFixture):
+        """
+        Тест пакетной проверки токенов для API-шлюза
+        """
+        user = User(id=7, username="gateway_user", first_name="John", last_name="Doe", role=Role(id=1, name="user"))
+        find_mock = mocker.patch('app.auth.router.UsersDAO.find_all_by_ids', return_value=[user])
+        fingerprint = build_client_fingerprint("gateway-agent", "10.0.0.7")
+        tokens = await token_service.create_tokens(data={'sub': str(user.id)}, client_fingerprint=fingerprint)
+
+        result = await introspect_tokens(
+            SIntrospectionRequest(tokens=[
+                SIntrospectionItem(token=tokens["access_token"], client_ip="10.0.0.7", user_agent="gateway-agent"),
+                SIntrospectionItem(token=tokens["access_token"], client_ip="10.0.0.8", user_agent="gateway-agent"),
+                SIntrospectionItem(token=tokens["refresh_token"], client_ip="10.0.0.7", user_agent="gateway-agent"),
+                SIntrospectionItem(token="invalid_token", client_ip="10.0.0.7"),
+            ]),
+            mocker.AsyncMock(spec=AsyncSession),
+        )
+
+        assert [item.active for item in result.results] == [True, False, False, False]
+        assert result.results[0].sub == "7"
+        assert result.results[0].user.username == "gateway_user"
+        find_mock.assert_awaited_once_with([7])
+
+    async def test_verify_for_proxy(self, mocker: MockerFixture):
+        """
+        Тест проверки токена для nginx auth_request
+        """
+        self.setup_mocks(mocker)
+        tokens = await token_service.create_tokens(
+            data={'sub': '8'},
+            client_fingerprint=get_client_fingerprint(self.mock_request),
+        )
+
+        response = await verify_for_proxy(self.mock_request, tokens["access_token"])
+
+        assert response.status_code == 204
+        assert response.body == b""
+        assert response.headers['X-User-Id'] == '8'
+        assert 0 < int(response.headers['X-Accel-Expires']) <= settings.VERIFY_CACHE_SECONDS
+
+        with pytest.raises(NoJwtException):
+            await verify_for_proxy(self.mock_request, tokens["refresh_token"])
+        with pytest.raises(NoJwtException):
+            await verify_for_proxy(self.mock_request, "invalid_token")
+
+    async def test_verify_for_proxy_store_unavailable(self, mocker: MockerFixture):
+        """
+        Тест отказа в доступе при недоступном хранилище сессий
+        """
+        self.setup_mocks(mocker)
+        mocker.patch.object(settings, 'REDIS_BREAKER_POLICY', 'fail_closed')
+        tokens = await token_service.create_tokens(
+            data={'sub': '8'},
+            client_fingerprint=get_client_fingerprint(self.mock_request),
+        )
+        mocker.patch.object(
+            token_service.token_store,
+            'is_token_verified',
+            side_effect=RedisConnectionError("Redis недоступен"),
+        )
+
+        with pytest.raises(NoJwtException):
+            await verify_for_proxy(self.mock_request, tokens["access_token"])
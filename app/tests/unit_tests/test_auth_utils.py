@@ -1,7 +1,16 @@
+import asyncio
+import threading
+import time
+
 import pytest
 from datetime import datetime, timedelta, timezone
 from pytest_mock import MockerFixture
-from app.auth.utils import password_service, token_service
+from redis.exceptions import ConnectionError as RedisConnectionError
+from app.auth.hashing import MIN_ROUNDS, PasswordHashExecutor, build_crypt_context, calibrate_rounds
+from app.auth.token_cache import TokenPayloadCache
+from app.auth.utils import PasswordService, TokenService, password_service, token_service
+from app.config import settings
+from app.exceptions import PasswordHashQueueFullException, TokenStoreUnavailableException
 from app.tests.unit_tests.base import BaseUnitTest
 
 
@@ -56,6 +65,86 @@ class TestPasswordService(BaseUnitTest):
         else:
             assert not password_service.verify_password(password, hashed) if password else True
 
+    async def test_password_hashing_async(self):
+        """Тест хеширования пароля вне event loop"""
+        password = "test_password123"
+
+        hashed = await password_service.get_password_hash_async(password)
+
+        assert hashed != password
+        assert await password_service.verify_password_async(password, hashed)
+        assert not await password_service.verify_password_async("wrong_password", hashed)
+
+    async def test_authenticate_user_async(self, mocker: MockerFixture):
+        """Тест аутентификации пользователя вне event loop"""
+        password = "test_password123"
+        mock_user = mocker.Mock(password=password_service.get_password_hash(password))
+
+        assert await password_service.authenticate_user_async(user=mock_user, password=password)
+        assert not await password_service.authenticate_user_async(user=mock_user, password="wrong_password")
+
+    async def test_password_hash_queue_full(self):
+        """Тест отклонения операций при переполнении очереди"""
+        executor = PasswordHashExecutor(executor_type='thread', max_workers=1, max_queue=1)
+        release = threading.Event()
+
+        try:
+            running = asyncio.create_task(executor.run(release.wait))
+            queued = asyncio.create_task(executor.run(release.wait))
+            await asyncio.sleep(0.05)
+
+            with pytest.raises(PasswordHashQueueFullException):
+                await executor.run(release.wait)
+        finally:
+            release.set()
+            await asyncio.gather(running, queued)
+            executor.shutdown()
+
+    async def test_password_hash_slot_held_until_cancelled_operation_finishes(self):
+        """Тест того, что отмена запроса не освобождает слот до завершения операции в пуле"""
+        executor = PasswordHashExecutor(executor_type='thread', max_workers=1, max_queue=1)
+        release = threading.Event()
+
+        try:
+            running = asyncio.create_task(executor.run(release.wait))
+            await asyncio.sleep(0.05)
+            running.cancel()
+            await asyncio.sleep(0.05)
+
+            assert executor._active == 1
+            queued = asyncio.create_task(executor.run(time.time))
+            await asyncio.sleep(0.05)
+            assert not queued.done()
+
+            release.set()
+            await asyncio.wait_for(queued, timeout=1)
+            assert executor._active == 0
+        finally:
+            release.set()
+            executor.shutdown()
+
+    async def test_authenticate_user_rehashes_outdated_hash(self, mocker: MockerFixture):
+        """Тест пересчета хеша с устаревшей стоимостью при входе"""
+        password = "test_password123"
+        service = PasswordService()
+        service.configure(rounds=10)
+        mock_user = mocker.Mock(id=1, password=build_crypt_context('bcrypt', rounds=11).hash(password))
+        update_mock = mocker.patch.object(service, '_update_password_hash')
+
+        try:
+            assert await service.authenticate_user_async(user=mock_user, password=password)
+        finally:
+            service.shutdown()
+
+        update_mock.assert_awaited_once()
+        new_hash = update_mock.await_args.args[1]
+        assert new_hash.startswith("$2b$10$")
+        assert service.verify_password(password, new_hash)
+
+    def test_calibrate_rounds_respects_minimum(self):
+        """Тест того, что калибровка не опускает стоимость ниже минимальной"""
+        assert calibrate_rounds('bcrypt', target_ms=1) == MIN_ROUNDS['bcrypt']
+
 
 class TestTokenService(BaseUnitTest):
     """Тесты для сервиса работы с токенами"""
@@ -169,4 +258,236 @@ class TestTokenService(BaseUnitTest):
                     token=token,
                     client_fingerprint=fingerprint,
                     token_type=token_type
-                )
\ No newline at end of file
+                )
+
+
+class TestRefreshTokenRotation(BaseUnitTest):
+    """Тесты атомарной ротации refresh-токена"""
+
+    async def test_rotate_tokens(self):
+        """Тест обмена refresh-токена на новую пару"""
+        tokens = await token_service.create_tokens(data={"sub": "401"}, client_fingerprint="device")
+
+        new_tokens = await token_service.rotate_tokens(tokens["refresh_token"], {"sub": "401"}, "device")
+
+        assert new_tokens["refresh_token"] != tokens["refresh_token"]
+        assert await token_service.verify_token(new_tokens["access_token"], "401", "access", "device")
+        assert await token_service.verify_token(new_tokens["refresh_token"], "401", "refresh", "device")
+
+    async def test_reused_refresh_token_revokes_session(self):
+        """Тест отзыва сессии при повторном использовании refresh-токена"""
+        tokens = await token_service.create_tokens(data={"sub": "402"}, client_fingerprint="device")
+        new_tokens = await token_service.rotate_tokens(tokens["refresh_token"], {"sub": "402"}, "device")
+
+        assert await token_service.rotate_tokens(tokens["refresh_token"], {"sub": "402"}, "device") is None
+        assert not await token_service.verify_token(new_tokens["refresh_token"], "402", "refresh", "device")
+
+    async def test_unrelated_token_does_not_revoke_session(self):
+        """Тест того, что токен, не выданный сессии как refresh-токен, не отзывает ее"""
+        tokens = await token_service.create_tokens(data={"sub": "404"}, client_fingerprint="device")
+        other_tokens = await token_service.create_tokens(data={"sub": "404"}, client_fingerprint="other_device")
+
+        for token in (tokens["access_token"], other_tokens["refresh_token"]):
+            assert await token_service.rotate_tokens(token, {"sub": "404"}, "device") is None
+
+        assert await token_service.verify_token(tokens["refresh_token"], "404", "refresh", "device")
+
+    async def test_concurrent_rotation(self):
+        """Тест того, что из параллельных обновлений одним токеном успешно только одно"""
+        tokens = await token_service.create_tokens(data={"sub": "403"}, client_fingerprint="device")
+
+        results = await asyncio.gather(*[
+            token_service.rotate_tokens(tokens["refresh_token"], {"sub": "403"}, "device")
+            for _ in range(5)
+        ])
+
+        assert sum(result is not None for result in results) == 1
+
+
+class TestDegradedVerification(BaseUnitTest):
+    """Тесты проверки токенов при недоступном хранилище сессий"""
+
+    @pytest.fixture
+    def unavailable_store_service(self, mocker: MockerFixture) -> TokenService:
+        service = TokenService()
+        mocker.patch.object(
+            service.token_store,
+            'is_token_verified',
+            side_effect=RedisConnectionError("Redis недоступен"),
+        )
+        return service
+
+    @pytest.mark.parametrize("policy", ['fail_closed', 'grace'])
+    async def test_refresh_token_fails_closed(self, unavailable_store_service: TokenService, mocker: MockerFixture, policy: str):
+        """Тест того, что refresh-токен без хранилища не принимается"""
+        mocker.patch.object(settings, 'REDIS_BREAKER_POLICY', policy)
+
+        with pytest.raises(TokenStoreUnavailableException):
+            await unavailable_store_service.verify_token("token", 1, "refresh", "device")
+
+    async def test_access_token_fails_closed(self, unavailable_store_service: TokenService, mocker: MockerFixture):
+        """Тест политики fail_closed для токена доступа"""
+        mocker.patch.object(settings, 'REDIS_BREAKER_POLICY', 'fail_closed')
+
+        with pytest.raises(TokenStoreUnavailableException):
+            await unavailable_store_service.verify_token("token", 1, "access", "device")
+
+    async def test_access_token_grace_window(self, unavailable_store_service: TokenService, mocker: MockerFixture):
+        """Тест приема токенов доступа по подписи в течение grace-окна"""
+        mocker.patch.object(settings, 'REDIS_BREAKER_POLICY', 'grace')
+        mocker.patch.object(settings, 'REDIS_BREAKER_GRACE_SECONDS', 30)
+        breaker = unavailable_store_service.store_breaker
+
+        for _ in range(settings.REDIS_BREAKER_FAILURE_THRESHOLD + 1):
+            assert await unavailable_store_service.verify_token("token", 1, "access", "device")
+        assert breaker.state == breaker.OPEN
+
+        mocker.patch.object(breaker, 'open_duration', return_value=31)
+        with pytest.raises(TokenStoreUnavailableException):
+            await unavailable_store_service.verify_token("token", 1, "access", "device")
+
+
+class TestTokenPayloadCache(BaseUnitTest):
+    """Тесты для кеша проверенных токенов"""
+
+    def test_decode_token_uses_cache(self, mocker: MockerFixture):
+        """Тест того, что повторное декодирование токена не проверяет подпись"""
+        token = token_service._create_token(
+            {"sub": "123"},
+            "access",
+            datetime.now(timezone.utc) + timedelta(minutes=15)
+        )
+        decode_spy = mocker.spy(token_service.codec, 'decode')
+
+        first = token_service.decode_token(token)
+        second = token_service.decode_token(token)
+
+        assert first == second
+        assert decode_spy.call_count == 1
+
+    def test_expired_entry_is_evicted(self):
+        """Тест того, что запись не отдается после истечения токена"""
+        cache = TokenPayloadCache(max_size=10)
+        cache.set("expired", {"sub": "1", "exp": int(time.time()) - 1})
+
+        assert cache.get("expired") is None
+        assert cache.misses == 1
+
+    def test_size_limit(self):
+        """Тест вытеснения давно не использованных записей"""
+        cache = TokenPayloadCache(max_size=2)
+        expire = int(time.time()) + 60
+        for token in ("first", "second"):
+            cache.set(token, {"sub": token, "exp": expire})
+
+        cache.get("first")
+        cache.set("third", {"sub": "third", "exp": expire})
+
+        assert cache.get("second") is None
+        assert cache.get("first") == {"sub": "first", "exp": expire}
+        assert cache.hits == 2
+
+
+class TestTokenEpochMode(BaseUnitTest):
+    """Тесты проверки токенов доступа по эпохам отзыва"""
+
+    @pytest.fixture
+    def epoch_token_service(self, mocker: MockerFixture, redis_token_manager) -> TokenService:
+        mocker.patch.object(settings, 'TOKEN_EPOCH_MODE', True)
+        service = TokenService()
+        service.token_store = redis_token_manager
+        return service
+
+    async def test_access_token_is_not_stored(self, epoch_token_service: TokenService):
+        """Тест того, что токен доступа проверяется по эпохам без хранения в Redis"""
+        tokens = await epoch_token_service.create_tokens(data={"sub": "321"}, client_fingerprint="device")
+
+        stored_token = await epoch_token_service.token_store.get_token_digest(
+            subject="321",
+            token_type="access",
+            client_fingerprint="device",
+        )
+
+        assert stored_token is None
+        assert await epoch_token_service.verify_token(tokens["access_token"], "321", "access", "device")
+        assert await epoch_token_service.verify_token(tokens["refresh_token"], "321", "refresh", "device")
+
+    async def test_logout_bumps_session_epoch(self, epoch_token_service: TokenService):
+        """Тест отзыва токенов только одной сессии при выходе"""
+        first = await epoch_token_service.create_tokens(data={"sub": "322"}, client_fingerprint="first")
+        second = await epoch_token_service.create_tokens(data={"sub": "322"}, client_fingerprint="second")
+
+        await epoch_token_service.invalidate_token_pair(user_id="322", client_fingerprint="first")
+
+        assert not await epoch_token_service.verify_token(first["access_token"], "322", "access", "first")
+        assert not await epoch_token_service.verify_token(first["refresh_token"], "322", "refresh", "first")
+        assert await epoch_token_service.verify_token(second["access_token"], "322", "access", "second")
+
+        relogin = await epoch_token_service.create_tokens(data={"sub": "322"}, client_fingerprint="first")
+        assert await epoch_token_service.verify_token(relogin["access_token"], "322", "access", "first")
+
+    async def test_invalidate_all_bumps_user_epoch(self, epoch_token_service: TokenService):
+        """Тест отзыва токенов доступа на всех устройствах"""
+        devices = ["first", "second"]
+        tokens = {
+            device: await epoch_token_service.create_tokens(data={"sub": "323"}, client_fingerprint=device)
+            for device in devices
+        }
+
+        await epoch_token_service.invalidate_all_tokens(user_id="323")
+
+        for device in devices:
+            assert not await epoch_token_service.verify_token(tokens[device]["access_token"], "323", "access", device)
+
+    async def test_verify_tokens_batches_epoch_lookups(self, epoch_token_service: TokenService, mocker: MockerFixture):
+        """Тест того, что эпохи пакета токенов запрашиваются одним запросом"""
+        sessions = [("324", "first"), ("324", "second"), ("325", "first")]
+        tokens = [
+            await epoch_token_service.create_tokens(data={"sub": user_id}, client_fingerprint=device)
+            for user_id, device in sessions
+        ]
+        await epoch_token_service.invalidate_token_pair(user_id="324", client_fingerprint="second")
+        epoch_token_service.epoch_cache.invalidate("324")
+        epoch_token_service.epoch_cache.invalidate("325")
+
+        store = epoch_token_service.token_store
+        get_epochs_spy = mocker.spy(store, 'get_epochs')
+        get_many_epochs_spy = mocker.spy(store, 'get_many_epochs')
+
+        results = await epoch_token_service.verify_tokens([
+            (
+                issued["access_token"], user_id, "access", device,
+                epoch_token_service.decode_token(issued["access_token"]),
+            )
+            for issued, (user_id, device) in zip([*tokens, tokens[0]], [*sessions, sessions[0]])
+        ])
+
+        assert results == [True, False, True, True]
+        get_many_epochs_spy.assert_called_once()
+        assert len(get_many_epochs_spy.call_args.args[0]) == 3
+        get_epochs_spy.assert_not_called()
+
+    async def test_new_token_accepted_by_worker_with_stale_cache(
+            self,
+            epoch_token_service: TokenService,
+            redis_token_manager,
+    ):
+        """Тест того, что токен, выпущенный после выхода, принимается воркером с устаревшим кешем эпох"""
+        other_worker = TokenService()
+        other_worker.token_store = redis_token_manager
+
+        first = await epoch_token_service.create_tokens(data={"sub": "326"}, client_fingerprint="device")
+        assert await other_worker.verify_token(first["access_token"], "326", "access", "device")
+
+        await epoch_token_service.invalidate_token_pair(user_id="326", client_fingerprint="device")
+        relogin = await epoch_token_service.create_tokens(data={"sub": "326"}, client_fingerprint="device")
+
+        assert await epoch_token_service.verify_token(relogin["access_token"], "326", "access", "device")
+        assert await other_worker.verify_token(relogin["access_token"], "326", "access", "device")
+        assert not await other_worker.verify_token(first["access_token"], "326", "access", "device")
+        assert await other_worker.verify_tokens([
+            (
+                relogin["access_token"], "326", "access", "device",
+                other_worker.decode_token(relogin["access_token"]),
+            ),
+        ]) == [True]
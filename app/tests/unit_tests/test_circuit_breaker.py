@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from pytest_mock import MockerFixture
+from redis.exceptions import ConnectionError
+
+from app.auth.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+def create_breaker(**kwargs) -> CircuitBreaker:
+    options = dict(
+        name="test_store",
+        failure_threshold=2,
+        call_timeout=0.05,
+        slow_call_seconds=0.02,
+        reset_seconds=60,
+        errors=(ConnectionError,),
+    )
+    return CircuitBreaker(**{**options, **kwargs})
+
+
+async def fail():
+    raise ConnectionError("Redis недоступен")
+
+
+async def succeed():
+    return "ok"
+
+
+async def test_breaker_opens_after_failures():
+    """Тест размыкания после нескольких неудачных вызовов подряд"""
+    breaker = create_breaker()
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await breaker.call(fail)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(succeed)
+
+
+async def test_breaker_counts_timeouts_and_slow_calls():
+    """Тест того, что зависшие и медленные вызовы считаются неудачными"""
+    breaker = create_breaker()
+
+    with pytest.raises(TimeoutError):
+        await breaker.call(asyncio.sleep, 1)
+    assert await breaker.call(asyncio.sleep, 0.03, result="slow") == "slow"
+
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+async def test_breaker_closes_after_successful_trial(mocker: MockerFixture):
+    """Тест пробного вызова после времени размыкания"""
+    breaker = create_breaker(failure_threshold=1)
+    with pytest.raises(ConnectionError):
+        await breaker.call(fail)
+
+    monotonic = mocker.patch('app.auth.circuit_breaker.time.monotonic', return_value=breaker._retry_at)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(ConnectionError):
+        await breaker.call(fail)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    monotonic.return_value = breaker._retry_at
+    assert await breaker.call(succeed) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.open_duration() == 0
@@ -0,0 +1,70 @@
+import time
+
+import pytest
+from jose import jwt
+from jose.exceptions import ExpiredSignatureError, JWTError
+
+from app.auth.codecs import BaseJWTCodec, CODECS, create_codec, HS256Codec, JoseCodec
+
+
+SECRET_KEY = "test_secret_key"
+
+
+@pytest.mark.parametrize("encoder_name", list(CODECS))
+@pytest.mark.parametrize("decoder_name", list(CODECS))
+def test_codecs_are_compatible(encoder_name: str, decoder_name: str):
+    """Тест того, что токены любого кодека декодируются всеми остальными"""
+    payload = {"sub": "1", "exp": int(time.time()) + 60, "type": "access"}
+    token = CODECS[encoder_name]('HS256').encode(payload, SECRET_KEY, headers={"kid": "test"})
+
+    decoder = CODECS[decoder_name]('HS256')
+
+    assert decoder.decode(token, SECRET_KEY) == payload
+    assert decoder.get_unverified_header(token)["kid"] == "test"
+
+
+@pytest.mark.parametrize("codec_name", list(CODECS))
+def test_codec_rejects_expired_token(codec_name: str):
+    """Тест отклонения истекшего токена"""
+    codec = CODECS[codec_name]('HS256')
+    token = codec.encode({"sub": "1", "exp": int(time.time()) - 10}, SECRET_KEY)
+
+    with pytest.raises(ExpiredSignatureError):
+        codec.decode(token, SECRET_KEY)
+
+
+@pytest.mark.parametrize("codec_name", list(CODECS))
+@pytest.mark.parametrize(
+    "token_factory",
+    [
+        lambda: jwt.encode({"sub": "1"}, "other_secret", algorithm="HS256"),  # чужой ключ
+        lambda: jwt.encode({"sub": "1"}, SECRET_KEY, algorithm="HS512"),  # другой алгоритм
+        lambda: "invalid_token",  # некорректный формат
+        lambda: jwt.encode({"sub": "1"}, SECRET_KEY, algorithm="HS256")[:-2] + "xx",  # испорченная подпись
+        lambda: jwt.encode({"sub": "1", "aud": "other-service"}, SECRET_KEY, algorithm="HS256"),  # чужая аудитория
+        lambda: jwt.encode({"sub": "1", "jti": 1}, SECRET_KEY, algorithm="HS256"),  # jti не строка
+    ]
+)
+def test_codec_rejects_invalid_token(codec_name: str, token_factory):
+    """Тест отклонения невалидных токенов"""
+    with pytest.raises(JWTError):
+        CODECS[codec_name]('HS256').decode(token_factory(), SECRET_KEY)
+
+
+def test_create_codec_auto():
+    """Тест выбора кодека по алгоритму"""
+    assert isinstance(create_codec('auto', 'HS256'), HS256Codec)
+    assert isinstance(create_codec('auto', 'RS256'), JoseCodec)
+
+    with pytest.raises(ValueError):
+        create_codec('hs256', 'RS256')
+
+
+def test_codec_interface_is_abstract():
+    """Тест того, что кодек без реализации всех методов нельзя создать"""
+    class IncompleteCodec(BaseJWTCodec):
+        def encode(self, payload: dict, key, headers: dict | None = None) -> str:
+            return ""
+
+    with pytest.raises(TypeError):
+        IncompleteCodec('HS256')
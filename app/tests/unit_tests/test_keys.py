@@ -0,0 +1,75 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from jose import jwt
+
+from app.auth.keys import KeyRing
+
+
+def create_key_ring(keys_dir, algorithm: str = 'ES256') -> KeyRing:
+    key_ring = KeyRing(
+        algorithm=algorithm,
+        keys_dir=str(keys_dir),
+        rotation_interval=timedelta(days=30),
+        retention=timedelta(days=7),
+        reload_interval=60,
+        jwks_max_age=300,
+    )
+    key_ring.rotate_if_due()
+    return key_ring
+
+
+def test_key_ring_signs_and_publishes_jwks(tmp_path):
+    """Тест подписи токена активным ключом и проверки по JWKS"""
+    key_ring = create_key_ring(tmp_path)
+    signing_key = key_ring.active
+
+    token = jwt.encode({"sub": "1"}, signing_key.private_key, algorithm='ES256', headers={"kid": signing_key.kid})
+    jwks = key_ring.jwks()
+
+    assert [key['kid'] for key in jwks['keys']] == [signing_key.kid]
+    assert jwt.decode(token, jwks, algorithms=['ES256']) == {"sub": "1"}
+    assert "d" not in jwks['keys'][0]  # закрытая часть ключа не публикуется
+
+
+def test_key_ring_shared_between_workers(tmp_path):
+    """Тест того, что воркеры с общим каталогом используют один ключ"""
+    first, second = create_key_ring(tmp_path), create_key_ring(tmp_path)
+
+    assert first.active.kid == second.active.kid
+    assert second.get_verification_key(first.active.kid) is not None
+    assert len(list(tmp_path.glob("*.pem"))) == 1
+
+
+def test_key_ring_publishes_next_key_before_signing(tmp_path):
+    """Тест того, что ключ следующего периода сначала публикуется в JWKS и только потом подписывает"""
+    key_ring = create_key_ring(tmp_path)
+    current_kid = key_ring.active.kid
+    published_long_ago = time.time() - 3600
+    os.utime(tmp_path / f"{current_kid}.pem", (published_long_ago, published_long_ago))
+
+    next_kid = key_ring._current_kid(datetime.now(timezone.utc) + key_ring.rotation_interval)
+    key_ring._write_key(next_kid)
+    key_ring = create_key_ring(tmp_path)
+
+    assert {key['kid'] for key in key_ring.jwks()['keys']} == {current_kid, next_kid}
+    assert key_ring.active.kid == current_kid
+
+    # Ключ начинает подписывать, когда закешированные JWKS других сервисов уже содержат его
+    os.utime(tmp_path / f"{next_kid}.pem", (published_long_ago, published_long_ago))
+    assert create_key_ring(tmp_path).active.kid == next_kid
+
+
+def test_key_ring_removes_expired_keys(tmp_path):
+    """Тест удаления ключей, подписанные которыми токены уже истекли"""
+    key_ring = create_key_ring(tmp_path)
+    expired_at = datetime.now(timezone.utc) - timedelta(days=90)
+    expired_kid = key_ring._current_kid(expired_at)
+    key_ring._write_key(expired_kid)
+
+    key_ring.rotate_if_due()
+
+    assert key_ring.get_verification_key(expired_kid) is None
+    assert not (tmp_path / f"{expired_kid}.pem").exists()
+    assert key_ring.active.kid == key_ring._current_kid(datetime.now(timezone.utc))
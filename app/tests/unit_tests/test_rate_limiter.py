@@ -0,0 +1,63 @@
+import pytest
+from pytest_mock import MockerFixture
+
+from app.auth.rate_limiter import LoginRateLimiter
+from app.config import settings
+from app.exceptions import TooManyRequestsException
+
+
+async def test_login_rate_limit_per_username(redis_token_manager):
+    """Тест ограничения попыток входа по логину"""
+    limiter = LoginRateLimiter(redis_token_manager)
+
+    for i in range(settings.LOGIN_RATE_LIMIT_PER_USERNAME):
+        await limiter.check(client_ip=f"10.0.0.{i}", username="limited_user")
+
+    with pytest.raises(TooManyRequestsException) as exc_info:
+        await limiter.check(client_ip="10.0.1.1", username="limited_user")
+
+    assert int(exc_info.value.headers['Retry-After']) > 0
+
+    # Другой логин с нового IP-адреса не блокируется
+    await limiter.check(client_ip="10.0.1.1", username="other_user")
+
+
+async def test_login_rate_limit_local_prefilter(redis_token_manager, mocker: MockerFixture):
+    """Тест того, что заблокированный ключ отклоняется без обращения к Redis"""
+    limiter = LoginRateLimiter(redis_token_manager)
+
+    for i in range(settings.LOGIN_RATE_LIMIT_PER_IP):
+        await limiter.check(client_ip="10.0.2.1", username=f"user_{i}")
+
+    with pytest.raises(TooManyRequestsException):
+        await limiter.check(client_ip="10.0.2.1", username="another")
+
+    script_spy = mocker.spy(limiter, '_get_script')
+    with pytest.raises(TooManyRequestsException):
+        await limiter.check(client_ip="10.0.2.1", username="yet_another")
+
+    script_spy.assert_not_called()
+
+
+async def test_login_rate_limit_without_redis():
+    """Тест скользящего окна в памяти процесса, когда Redis не используется"""
+    limiter = LoginRateLimiter(None)
+
+    for i in range(settings.LOGIN_RATE_LIMIT_PER_USERNAME):
+        await limiter.check(client_ip=f"10.0.4.{i}", username="memory_user")
+
+    with pytest.raises(TooManyRequestsException) as exc_info:
+        await limiter.check(client_ip="10.0.5.1", username="memory_user")
+
+    assert int(exc_info.value.headers['Retry-After']) > 0
+    await limiter.check(client_ip="10.0.5.1", username="other_memory_user")
+
+
+async def test_login_rate_limit_unknown_client_ip():
+    """Тест того, что без IP-адреса клиента учитывается только лимит по логину"""
+    limiter = LoginRateLimiter(None)
+
+    for i in range(settings.LOGIN_RATE_LIMIT_PER_IP + 1):
+        await limiter.check(client_ip=None, username=f"unknown_ip_user_{i}")
+
+    assert all(":user:" in key for key in limiter._attempts)
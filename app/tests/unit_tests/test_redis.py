@@ -1,3 +1,9 @@
+import pytest
+
+from app.config import settings
+from app.dao.redis import RedisClientManager
+
+
 async def test_redis_connection(redis_client):
     # Test that we can connect to Redis
     assert await redis_client.ping()
@@ -45,4 +51,30 @@ async def test_redis_list_operations(redis_client):
     
     # Test getting all items
     stored_list = await redis_client.lrange("test_list", 0, -1)
-    assert stored_list == test_list 
\ No newline at end of file
+    assert stored_list == test_list 
+
+
+@pytest.fixture
+async def redis_client_manager():
+    """Менеджер клиента Redis, пулы которого закрываются после теста"""
+    manager = RedisClientManager("redis://localhost:6379/0")
+    yield manager
+    await manager.close()
+
+
+async def test_redis_client_manager_pool_settings(redis_client_manager: RedisClientManager):
+    """Тест создания общего клиента Redis по настройкам пула"""
+    manager = redis_client_manager
+
+    client = manager.client
+    pool = client.connection_pool
+
+    assert manager.client is client
+    assert pool.max_connections == settings.REDIS_MAX_CONNECTIONS
+    assert pool.connection_kwargs["socket_timeout"] == settings.REDIS_SOCKET_TIMEOUT
+    assert pool.connection_kwargs["health_check_interval"] == settings.REDIS_HEALTH_CHECK_INTERVAL
+    assert not pool.connection_kwargs["decode_responses"]
+
+    # После закрытия создается новый клиент; его пул закрывает фикстура
+    await manager.close()
+    assert manager.client is not client
@@ -1,3 +1,15 @@
+import asyncio
+import time
+
+import pytest
+from redis.asyncio import Redis
+from redis.crc import key_slot
+
+from app.auth.redis_manager import RedisTokenManager
+from app.auth.token_cache import TokenNearCache
+from app.config import settings
+
+
 async def test_store_and_get_token(redis_token_manager):
     """Тест сохранения и получения токена"""
     # Тестовые данные
@@ -16,14 +28,14 @@ async def test_store_and_get_token(redis_token_manager):
         client_fingerprint=fingerprint
     )
 
-    # Получаем токен
-    stored_token = await redis_token_manager.get_token(
+    # Получаем дайджест токена
+    stored_token = await redis_token_manager.get_token_digest(
         subject=subject,
         token_type=token_type,
         client_fingerprint=fingerprint
     )
 
-    assert stored_token == token
+    assert stored_token == RedisTokenManager.token_digest(token)
 
 
 async def test_invalidate_token(redis_token_manager):
@@ -50,7 +62,7 @@ async def test_invalidate_token(redis_token_manager):
     )
 
     # Проверяем что токен удален
-    stored_token = await redis_token_manager.get_token(
+    stored_token = await redis_token_manager.get_token_digest(
         subject=subject,
         token_type=token_type,
         client_fingerprint=fingerprint
@@ -86,7 +98,7 @@ async def test_invalidate_token_pair(redis_token_manager):
 
     # Проверяем что оба токена удалены
     for token_type in tokens.keys():
-        stored_token = await redis_token_manager.get_token(
+        stored_token = await redis_token_manager.get_token_digest(
             subject=subject,
             token_type=token_type,
             client_fingerprint=fingerprint
@@ -116,7 +128,7 @@ async def test_invalidate_all_user_tokens(redis_token_manager):
     # Проверяем что все токены удалены
     for device in devices:
         for token_type in ["access", "refresh"]:
-            stored_token = await redis_token_manager.get_token(
+            stored_token = await redis_token_manager.get_token_digest(
                 subject=subject,
                 token_type=token_type,
                 client_fingerprint=device
@@ -154,4 +166,208 @@ async def test_is_token_verified(redis_token_manager):
         token_type=token_type,
         token="wrong_token",
         client_fingerprint=fingerprint
-    ) 
\ No newline at end of file
+    ) 
+
+
+async def test_near_cache_invalidated_by_other_worker(redis_token_manager, mocker):
+    """Тест того, что изменение токена другим воркером сбрасывает локальный кеш"""
+    mocker.patch.object(settings, 'TOKEN_NEAR_CACHE_ENABLED', True)
+    cached_manager, other_manager = RedisTokenManager(), RedisTokenManager()
+    cached_manager.redis_client = other_manager.redis_client = redis_token_manager.redis_client
+    key_args = {"subject": 222, "token_type": "access", "client_fingerprint": "test_device"}
+
+    listener = asyncio.create_task(cached_manager.run_invalidation_listener())
+    try:
+        while not cached_manager.near_cache.active:
+            await asyncio.sleep(0.01)
+
+        session_key = cached_manager._get_session_key(222, "test_device")
+        generation = cached_manager.near_cache.generation
+        await other_manager.store_token(token="first_token", expire_time=300, **key_args)
+        # Оповещение о записи должно дойти до чтения, иначе прочитанное не кешируется
+        while cached_manager.near_cache.generation == generation:
+            await asyncio.sleep(0.01)
+        assert await cached_manager.is_token_verified(token="first_token", **key_args)
+        assert cached_manager.near_cache.get(session_key) is not TokenNearCache.MISSING
+
+        await other_manager.invalidate_token(**key_args)
+        for _ in range(100):
+            if cached_manager.near_cache.get(session_key) is TokenNearCache.MISSING:
+                break
+            await asyncio.sleep(0.01)
+
+        assert not await cached_manager.is_token_verified(token="first_token", **key_args)
+    finally:
+        listener.cancel()
+
+
+async def test_user_sessions_index(redis_token_manager):
+    """Тест индекса сессий пользователя"""
+    subject = 1000
+    for device in ["device1", "device2"]:
+        for token_type, expire_time in [("refresh", 600), ("access", 300)]:
+            await redis_token_manager.store_token(
+                subject=subject,
+                token=f"{token_type}_token_{device}",
+                token_type=token_type,
+                expire_time=expire_time,
+                client_fingerprint=device
+            )
+
+    sessions = await redis_token_manager.list_user_sessions(subject)
+    assert sorted(sessions) == sorted(RedisTokenManager.session_id(device) for device in ["device1", "device2"])
+    # Время истечения сессии определяется самым долгоживущим токеном
+    assert sessions[RedisTokenManager.session_id("device1")] - time.time() > 500
+
+    await redis_token_manager.invalidate_token_pair(subject=subject, client_fingerprint="device1")
+    assert list(await redis_token_manager.list_user_sessions(subject)) == [RedisTokenManager.session_id("device2")]
+
+    await redis_token_manager.invalidate_all_user_tokens(subject)
+    assert await redis_token_manager.list_user_sessions(subject) == {}
+    assert await redis_token_manager.redis_client.keys(f"*{{{subject}}}*") == []
+
+
+async def test_store_token_pair(redis_token_manager):
+    """Тест сохранения пары токенов за один запрос"""
+    subject = 1001
+    fingerprint = "test_device"
+
+    await redis_token_manager.store_token_pair(
+        subject=subject,
+        access_token="access_token_1001",
+        refresh_token="refresh_token_1001",
+        refresh_expire_time=600,
+        client_fingerprint=fingerprint,
+    )
+
+    for token_type in ["access", "refresh"]:
+        assert await redis_token_manager.is_token_verified(
+            subject=subject,
+            token_type=token_type,
+            token=f"{token_type}_token_1001",
+            client_fingerprint=fingerprint,
+        )
+
+    # Сессия хранится одной записью со временем жизни refresh-токена
+    session_key = redis_token_manager._get_session_key(subject, fingerprint)
+    assert await redis_token_manager.redis_client.keys(f"ts:{{{subject}}}:*") == [session_key]
+    assert 300 < await redis_token_manager.redis_client.ttl(session_key) <= 600
+
+
+async def test_user_keys_share_cluster_slot(redis_token_manager):
+    """Тест того, что все ключи пользователя попадают в один слот Redis Cluster"""
+    subject = 1002
+    keys = [
+        redis_token_manager._get_session_key(subject, "device1"),
+        redis_token_manager._get_session_key(subject, "device2"),
+        redis_token_manager._get_sessions_key(subject),
+        *redis_token_manager._get_epoch_keys(subject, "device1"),
+    ]
+
+    assert len({key_slot(key) for key in keys}) == 1
+
+
+@pytest.fixture
+async def replica_client(redis_token_manager):
+    """Клиент реплики: ее роль играет отдельная база тестового Redis, очищаемая после теста"""
+    pool = redis_token_manager.redis_client.connection_pool
+    replica = Redis(connection_pool=pool.__class__(
+        connection_class=pool.connection_class,
+        **{**pool.connection_kwargs, "db": 2},
+    ))
+    try:
+        yield replica
+    finally:
+        await replica.flushdb()
+        await replica.aclose(close_connection_pool=True)
+
+
+async def test_verification_reads_from_replica(redis_token_manager, replica_client, mocker):
+    """Тест проверки токенов на реплике и ожидания реплик после изменения сессий"""
+    manager = RedisTokenManager()
+    manager.redis_client = redis_token_manager.redis_client
+    manager.replica_client = replica = replica_client
+    key_args = {"subject": 1003, "token_type": "refresh", "client_fingerprint": "test_device"}
+    session_key = manager._get_session_key(1003, "test_device")
+
+    async def replicate(client, num_replicas, timeout_ms) -> None:
+        """WAIT: запись сессии переносится на реплику"""
+        session = await manager.redis_client.hgetall(session_key)
+        await replica.delete(session_key)
+        if session:
+            await replica.hset(session_key, mapping=session)
+
+    mocker.patch.object(settings, 'REDIS_REPLICA_WAIT_COUNT', 1)
+    wait_mock = mocker.patch('app.auth.redis_manager.wait_for_replicas', side_effect=replicate)
+
+    await manager.store_token_pair(
+        subject=1003,
+        access_token="access_token_1003",
+        refresh_token="refresh_token_1003",
+        refresh_expire_time=600,
+        client_fingerprint="test_device",
+    )
+    assert await replica.exists(session_key)
+
+    # Токен, которого еще нет на реплике, перепроверяется на основном узле
+    await replica.delete(session_key)
+    assert await manager.is_token_verified(token="refresh_token_1003", **key_args)
+
+    # Проверка выполняется на реплике
+    await replica.hset(session_key, mapping=await manager.redis_client.hgetall(session_key))
+    await manager.redis_client.delete(session_key)
+    assert await manager.is_token_verified(token="refresh_token_1003", **key_args)
+
+    # Отзыв завершается после подтверждения репликами, поэтому реплика уже не принимает токен
+    await manager.invalidate_token_pair(subject=1003, client_fingerprint="test_device")
+    assert not await replica.exists(session_key)
+    assert not await manager.is_token_verified(token="refresh_token_1003", **key_args)
+    assert wait_mock.call_count == 2
+
+
+async def test_failed_replica_wait_does_not_repeat_rotation(redis_token_manager, mocker):
+    """Тест того, что ошибка WAIT не повторяет ротацию и не отзывает сессию"""
+    mocker.patch.object(settings, 'REDIS_REPLICA_WAIT_COUNT', 1)
+    # Тестовый Redis не поддерживает WAIT, поэтому ожидание реплик завершается ошибкой
+    await redis_token_manager.store_token_pair(
+        subject=1004,
+        access_token="access_token_1004",
+        refresh_token="refresh_token_1004",
+        refresh_expire_time=600,
+        client_fingerprint="test_device",
+    )
+
+    result = await redis_token_manager.rotate_token_pair(
+        subject=1004,
+        client_fingerprint="test_device",
+        presented_refresh_token="refresh_token_1004",
+        access_token="access_token_1004_2",
+        refresh_token="refresh_token_1004_2",
+        refresh_expire_time=600,
+    )
+
+    assert result == "rotated"
+    assert await redis_token_manager.is_token_verified(
+        subject=1004, token_type="refresh", token="refresh_token_1004_2", client_fingerprint="test_device",
+    )
+
+
+async def test_are_tokens_verified(redis_token_manager):
+    """Тест проверки пакета токенов одним конвейером"""
+    await redis_token_manager.store_token_pair(
+        subject=1301,
+        access_token="batch_access",
+        refresh_token="batch_refresh",
+        refresh_expire_time=600,
+        client_fingerprint="device1",
+    )
+
+    results = await redis_token_manager.are_tokens_verified([
+        (1301, "access", "batch_access", "device1"),
+        (1301, "refresh", "batch_refresh", "device1"),
+        (1301, "access", "other_access", "device1"),
+        (1301, "access", "batch_access", "device2"),
+        (1302, "access", "batch_access", "device1"),
+    ])
+
+    assert results == [True, True, False, False, False]
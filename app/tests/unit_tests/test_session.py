@@ -0,0 +1,32 @@
+from pytest_mock import MockerFixture
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.models import User
+from app.dao.database import async_read_session_maker, engine
+from app.dao.session import get_autocommit_engine
+
+
+async def test_read_session_releases_connection(mocker: MockerFixture):
+    """Тест возврата соединения после запроса в сессии на чтение"""
+    mocker.patch.object(AsyncSession, 'execute', return_value="result")
+    mocker.patch.object(AsyncSession, 'in_transaction', return_value=True)
+    commit_mock = mocker.patch.object(AsyncSession, 'commit')
+
+    async with async_read_session_maker(bind=get_autocommit_engine(engine)) as session:
+        assert await session.execute(select(User)) == "result"
+        commit_mock.assert_awaited_once()
+
+        # Несохраненные изменения не фиксируются неявно
+        session.add(User(username="pending", first_name="John", last_name="Doe", password="hash"))
+        await session.execute(select(User))
+        commit_mock.assert_awaited_once()
+
+
+def test_autocommit_engine_shares_pool():
+    """Тест того, что движок AUTOCOMMIT использует пул исходного движка"""
+    autocommit_engine = get_autocommit_engine(engine)
+
+    assert autocommit_engine is get_autocommit_engine(engine)
+    assert autocommit_engine.sync_engine.pool is engine.sync_engine.pool
+    assert autocommit_engine.get_execution_options()["isolation_level"] == "AUTOCOMMIT"
@@ -0,0 +1,79 @@
+import time
+
+from pytest_mock import MockerFixture
+
+from app.auth.redis_manager import RedisTokenManager
+from app.auth.token_store import InMemoryTokenStore
+
+
+async def test_memory_store_token_pair():
+    """Тест сохранения и проверки пары токенов в памяти"""
+    store = InMemoryTokenStore()
+    await store.store_token_pair("1", "access_token", "refresh_token", 3600, "device")
+
+    assert await store.is_token_verified("1", "access", "access_token", "device")
+    assert await store.is_token_verified("1", "refresh", "refresh_token", "device")
+    assert not await store.is_token_verified("1", "access", "other_token", "device")
+    assert not await store.is_token_verified("1", "access", "access_token", "other_device")
+    assert await store.get_token_digest("1", "refresh", "device") == RedisTokenManager.token_digest("refresh_token")
+
+
+async def test_memory_store_expiry(mocker: MockerFixture):
+    """Тест удаления истекших сессий по куче времен истечения"""
+    store = InMemoryTokenStore()
+    await store.store_token_pair("1", "access_token", "refresh_token", 60, "device")
+
+    monotonic = time.monotonic() + 61
+    mocker.patch('app.auth.token_store.time.monotonic', return_value=monotonic)
+    assert not await store.is_token_verified("1", "refresh", "refresh_token", "device")
+
+    # Запись другой сессии удаляет истекшие
+    await store.store_token_pair("2", "access_token", "refresh_token", 60, "device")
+    assert list(store._sessions) == [("2", "device")]
+    assert await store.list_user_sessions("1") == {}
+
+
+async def test_memory_store_invalidate_all_user_tokens():
+    """Тест отзыва всех сессий пользователя и входа после отзыва"""
+    store = InMemoryTokenStore()
+    for device in ["device1", "device2"]:
+        await store.store_token_pair("1", f"access_{device}", f"refresh_{device}", 3600, device)
+    await store.store_token_pair("2", "access_token", "refresh_token", 3600, "device1")
+
+    await store.invalidate_all_user_tokens("1")
+
+    assert not await store.is_token_verified("1", "access", "access_device1", "device1")
+    assert not await store.is_token_verified("1", "refresh", "refresh_device2", "device2")
+    assert await store.list_user_sessions("1") == {}
+    assert await store.is_token_verified("2", "access", "access_token", "device1")
+
+    await store.store_token_pair("1", "new_access", "new_refresh", 3600, "device1")
+    assert await store.is_token_verified("1", "access", "new_access", "device1")
+    assert list(await store.list_user_sessions("1")) == [RedisTokenManager.session_id("device1")]
+
+
+async def test_memory_store_rotate_token_pair():
+    """Тест ротации пары токенов и обнаружения повторного использования"""
+    store = InMemoryTokenStore()
+    await store.store_token_pair("1", "access_token", "refresh_token", 3600, "device")
+
+    assert await store.rotate_token_pair("1", "device", "refresh_token", "access_2", "refresh_2", 3600) == "rotated"
+    # Токен доступа сессии или посторонний токен не считаются повторным использованием
+    assert await store.rotate_token_pair("1", "device", "access_2", "access_3", "refresh_3", 3600) == "missing"
+    assert await store.rotate_token_pair("1", "device", "unrelated", "access_3", "refresh_3", 3600) == "missing"
+    assert await store.rotate_token_pair("1", "device", "refresh_token", "access_3", "refresh_3", 3600) == "reused"
+    assert await store.is_token_verified("1", "refresh", "refresh_2", "device")
+
+    await store.invalidate_token_pair("1", "device")
+    assert await store.rotate_token_pair("1", "device", "refresh_2", "access_3", "refresh_3", 3600) == "missing"
+
+
+async def test_memory_store_epochs():
+    """Тест эпох отзыва в памяти"""
+    store = InMemoryTokenStore()
+
+    assert await store.get_epochs("1", "device") == (0, 0)
+    assert await store.bump_session_epoch("1", "device", 3600) == 1
+    assert await store.bump_user_epoch("1") == 1
+    assert await store.get_epochs("1", "device") == (1, 1)
+    assert await store.get_epochs("1", "other_device") == (1, 0)
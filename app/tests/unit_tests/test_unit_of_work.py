@@ -0,0 +1,57 @@
+from pytest_mock import MockerFixture
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.auth.dao import UsersDAO
+from app.auth.models import User
+from app.dao.database import engine
+from app.dao.replicas import replica_router
+from app.dao.session import get_autocommit_engine
+from app.dao.unit_of_work import UnitOfWork
+
+
+async def test_unit_of_work_shares_sessions():
+    """Тест того, что зависимости запроса получают одни и те же сессии"""
+    async with UnitOfWork() as uow:
+        read_session = uow.read_session
+        assert uow.read_session is read_session
+        assert read_session.bind is get_autocommit_engine(replica_router.primary)
+
+        # После создания сессии на запись чтение идет через нее
+        write_session = uow.write_session
+        assert write_session is not read_session
+        assert uow.read_session is write_session
+
+
+async def test_unit_of_work_identity_map(mocker: MockerFixture):
+    """Тест того, что пользователь загружается не более одного раза за запрос"""
+    execute_mock = mocker.patch('sqlalchemy.orm.session.Session.execute')
+
+    async with UnitOfWork() as uow:
+        user = User(id=42, username="cached", first_name="John", last_name="Doe", password="hash", role_id=1)
+        make_transient_to_detached(user)
+        uow.read_session.add(user)
+
+        users_dao = UsersDAO(uow.read_session)
+        assert await users_dao.find_one_or_none_by_id(42) is user
+        assert await users_dao.find_one_or_none_by_id(42) is user
+
+    execute_mock.assert_not_called()
+
+
+async def test_unit_of_work_marks_failed_replica(mocker: MockerFixture):
+    """Тест исключения реплики после ошибки соединения в запросе"""
+    mocker.patch.object(replica_router, 'get_engine', return_value=mocker.sentinel.replica)
+    mocker.patch('app.dao.unit_of_work.get_autocommit_engine', return_value=engine)
+    mark_failed_mock = mocker.patch.object(replica_router, 'mark_failed')
+
+    error = DBAPIError("SELECT 1", None, OSError("connection lost"), connection_invalidated=True)
+    try:
+        async with UnitOfWork() as uow:
+            uow.read_session
+            raise error
+    except DBAPIError as e:
+        assert e is error
+
+    mark_failed_mock.assert_called_once_with(mocker.sentinel.replica)
+    assert uow._read_session is None
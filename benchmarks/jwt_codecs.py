@@ -0,0 +1,57 @@
+"""
+Сравнение производительности кодеков JWT
+
+Запуск: python -m benchmarks.jwt_codecs [--iterations N]
+
+Для каждого кодека измеряется число операций кодирования и декодирования в секунду,
+а также проверяется, что токены разных кодеков взаимно декодируются.
+"""
+import argparse
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.auth.codecs import CODECS, BaseJWTCodec
+
+
+def measure(func, iterations: int) -> float:
+    """Получить число операций в секунду"""
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return iterations / (time.perf_counter() - started_at)
+
+
+def check_compatibility(codecs: list[BaseJWTCodec], payload: dict, key: str) -> None:
+    """Проверить, что токен любого кодека декодируется всеми остальными"""
+    for encoder in codecs:
+        token = encoder.encode(payload, key)
+        for decoder in codecs:
+            assert decoder.decode(token, key) == payload, f"{encoder.name} -> {decoder.name}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    key = secrets.token_urlsafe(32)
+    payload = {
+        'sub': '12345',
+        'exp': int((datetime.now(timezone.utc) + timedelta(minutes=30)).timestamp()),
+        'type': 'access',
+    }
+    codecs = [codec_class('HS256') for codec_class in CODECS.values()]
+
+    check_compatibility(codecs, payload, key)
+
+    print(f"{'кодек':<10}{'encode, оп/с':>16}{'decode, оп/с':>16}")
+    for codec in codecs:
+        token = codec.encode(payload, key)
+        encode_rate = measure(lambda: codec.encode(payload, key), args.iterations)
+        decode_rate = measure(lambda: codec.decode(token, key), args.iterations)
+        print(f"{codec.name:<10}{encode_rate:>16.0f}{decode_rate:>16.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Сравнение памяти Redis на одну сессию для прежнего и компактного хранения токенов
+
+Запуск: python -m benchmarks.redis_memory [--sessions N] [--url redis://localhost:6379/15]
+
+Прежняя схема - две строки `{type}:{subject}:{fingerprint}` с полными JWT,
+компактная - запись RedisTokenManager с дайджестами токенов и индекс сессий.
+Память измеряется по приросту used_memory, поэтому бенчмарк нужно запускать
+на отдельной (пустой) базе Redis. Созданные ключи удаляются после замера.
+"""
+import argparse
+import asyncio
+import hashlib
+import secrets
+import time
+
+from redis.asyncio import Redis
+
+from app.auth.codecs import create_codec
+from app.auth.redis_manager import RedisTokenManager
+from app.config import settings
+
+
+ACCESS_EXPIRE_TIME = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+REFRESH_EXPIRE_TIME = settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+
+
+def generate_sessions(count: int, sessions_per_user: int) -> list[tuple[str, str, str, str]]:
+    """Сгенерировать сессии: пользователь, отпечаток клиента, токены доступа и обновления"""
+    codec = create_codec('auto', 'HS256')
+    key = secrets.token_urlsafe(32)
+    now = int(time.time())
+    sessions = []
+    for i in range(count):
+        subject = str(100000 + i // sessions_per_user)
+        fingerprint = hashlib.sha256(secrets.token_bytes(16)).hexdigest()
+        access_token = codec.encode({"sub": subject, "exp": now + ACCESS_EXPIRE_TIME, "type": "access"}, key)
+        refresh_token = codec.encode(
+            {"sub": subject, "jti": secrets.token_urlsafe(16), "exp": now + REFRESH_EXPIRE_TIME, "type": "refresh"},
+            key,
+        )
+        sessions.append((subject, fingerprint, access_token, refresh_token))
+    return sessions
+
+
+async def used_memory(client: Redis) -> int:
+    """Получить объем памяти, занятый данными Redis"""
+    return (await client.info('memory'))['used_memory']
+
+
+async def store_legacy(client: Redis, sessions: list[tuple[str, str, str, str]], batch_size: int = 1000) -> None:
+    """Сохранить сессии в прежней схеме"""
+    for start in range(0, len(sessions), batch_size):
+        async with client.pipeline(transaction=False) as pipe:
+            for subject, fingerprint, access_token, refresh_token in sessions[start:start + batch_size]:
+                pipe.set(f"access:{subject}:{fingerprint}", access_token, ex=ACCESS_EXPIRE_TIME)
+                pipe.set(f"refresh:{subject}:{fingerprint}", refresh_token, ex=REFRESH_EXPIRE_TIME)
+            await pipe.execute()
+
+
+async def store_compact(manager: RedisTokenManager, sessions: list[tuple[str, str, str, str]], batch_size: int = 1000) -> None:
+    """Сохранить сессии через RedisTokenManager"""
+    for start in range(0, len(sessions), batch_size):
+        await asyncio.gather(*[
+            manager.store_token_pair(
+                subject=subject,
+                access_token=access_token,
+                refresh_token=refresh_token,
+                refresh_expire_time=REFRESH_EXPIRE_TIME,
+                client_fingerprint=fingerprint,
+            )
+            for subject, fingerprint, access_token, refresh_token in sessions[start:start + batch_size]
+        ])
+
+
+async def measure(client: Redis, store, sessions: list) -> float:
+    """Получить прирост памяти в байтах на одну сессию"""
+    await client.flushdb()
+    before = await used_memory(client)
+    await store(sessions)
+    after = await used_memory(client)
+    await client.flushdb()
+    return (after - before) / len(sessions)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sessions', type=int, default=100000)
+    parser.add_argument('--sessions-per-user', type=int, default=3)
+    parser.add_argument('--url', default='redis://localhost:6379/15', help="отдельная база, будет очищена")
+    args = parser.parse_args()
+
+    client = Redis.from_url(args.url, decode_responses=False)
+    manager = RedisTokenManager()
+    manager.redis_client = client
+
+    sessions = generate_sessions(args.sessions, args.sessions_per_user)
+    try:
+        legacy = await measure(client, lambda items: store_legacy(client, items), sessions)
+        compact = await measure(client, lambda items: store_compact(manager, items), sessions)
+    finally:
+        await client.aclose()
+
+    print(f"{'схема':<12}{'байт на сессию':>16}")
+    print(f"{'прежняя':<12}{legacy:>16.0f}")
+    print(f"{'компактная':<12}{compact:>16.0f}")
+    print(f"экономия: {1 - compact / legacy:.0%}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())